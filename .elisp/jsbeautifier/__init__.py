@@ -1,7 +1,16 @@
 import sys
-import getopt
+import os
 import re
-import string
+import math
+import mmap
+import codecs
+import copy
+import time
+
+try:
+    intern = sys.intern
+except AttributeError:
+    pass # Python 2: a builtin
 
 #
 # Originally written by Einar Lielmanis et al.,
@@ -20,12 +29,34 @@ import string
 #   res = jsbeautifier.beautify('your javascript string')
 #   res = jsbeautifier.beautify_file('some_file.js')
 #
+# or, to get the result piece by piece without holding all of it in memory:
+#
+#   for chunk in jsbeautifier.beautify_iter('your javascript string'):
+#       out.write(chunk)
+#
 #  you may specify some options:
 #
 #   opts = jsbeautifier.default_options()
 #   opts.indent_size = 2
 #   res = jsbeautifier.beautify('some javascript', opts)
 #
+# results can be kept in an on-disk cache, so that unchanged inputs are
+# not formatted again (see jsbeautifier/cache.py):
+#
+#   opts.cache_dir = '/var/cache/jsbeautifier'
+#
+# JSON documents can take a faster path of their own (see
+# jsbeautifier/jsonmode.py), with the same result:
+#
+#   opts.json = True
+#   res = jsbeautifier.beautify('{"some": ["json"]}', opts)
+#
+# and to find out where the time goes, the result can come with the time
+# spent in each phase (unpacking, tokenizing, each handler, joining):
+#
+#   res, profile = jsbeautifier.beautify_profile('some javascript', opts)
+#   print(profile.report())
+#
 #
 # Here are the available options: (read source)
 
@@ -42,7 +73,14 @@ class BeautifierOptions:
         self.keep_array_indentation = False
         self.keep_function_indentation = False
         self.eval_code = False
+        self.unpack = True # run the unpackers (see jsbeautifier/unpackers)
+        self.unpack_depth = 1 # passes of the unpackers over packed layers
         self.unescape_strings = False
+        self.tokenizer = 'regex'
+        self.json = False # try the JSON fast path first
+        self.cache_dir = None
+        self.cache_size = 64 * 1024 * 1024
+        self.profile = None # called with a Profile after each beautify
 
 
 
@@ -57,7 +95,14 @@ indent_with_tabs = %s
 brace_style = %s
 keep_array_indentation = %s
 eval_code = %s
+unpack = %s
+unpack_depth = %d
 unescape_strings = %s
+tokenizer = %s
+json = %s
+cache_dir = %s
+cache_size = %d
+profile = %s
 """ % ( self.indent_size,
         self.indent_char,
         self.preserve_newlines,
@@ -67,13 +112,72 @@ unescape_strings = %s
         self.brace_style,
         self.keep_array_indentation,
         self.eval_code,
+        self.unpack,
+        self.unpack_depth,
         self.unescape_strings,
+        self.tokenizer,
+        self.json,
+        self.cache_dir,
+        self.cache_size,
+        self.profile,
         )
 
 
-class BeautifierFlags:
+# token types, as returned by the tokenizers; handlers are looked up by
+# indexing Beautifier.handlers with them
+TK_START_EXPR = 0
+TK_END_EXPR = 1
+TK_START_BLOCK = 2
+TK_END_BLOCK = 3
+TK_WORD = 4
+TK_SEMICOLON = 5
+TK_STRING = 6
+TK_EQUALS = 7
+TK_OPERATOR = 8
+TK_COMMA = 9
+TK_BLOCK_COMMENT = 10
+TK_INLINE_COMMENT = 11
+TK_COMMENT = 12
+TK_UNKNOWN = 13
+TK_EOF = 14
+
+TOKEN_NAMES = ('TK_START_EXPR',
+               'TK_END_EXPR',
+               'TK_START_BLOCK',
+               'TK_END_BLOCK',
+               'TK_WORD',
+               'TK_SEMICOLON',
+               'TK_STRING',
+               'TK_EQUALS',
+               'TK_OPERATOR',
+               'TK_COMMA',
+               'TK_BLOCK_COMMENT',
+               'TK_INLINE_COMMENT',
+               'TK_COMMENT',
+               'TK_UNKNOWN',
+               'TK_EOF')
+
+
+# parser modes, as kept in BeautifierFlags.mode. They are interned, so
+# that comparing them mostly comes down to an identity check.
+MODE_BLOCK = intern('BLOCK')
+MODE_DO_BLOCK = intern('DO_BLOCK')
+MODE_ARRAY = intern('[EXPRESSION]')
+MODE_INDENTED_ARRAY = intern('[INDENTED-EXPRESSION]')
+MODE_EXPRESSION = intern('(EXPRESSION)')
+MODE_FOR_EXPRESSION = intern('(FOR-EXPRESSION)')
+MODE_COND_EXPRESSION = intern('(COND-EXPRESSION)')
+
+
+class BeautifierFlags(object):
+    # one of these is pushed for every (, [ and {, so they are kept small
+    __slots__ = ('previous_mode', 'mode', 'var_line', 'var_line_tainted',
+                 'var_line_reindented', 'in_html_comment', 'if_line', 'in_case',
+                 'in_case_statement', 'eat_next_space', 'indentation_baseline',
+                 'indentation_level', 'ternary_depth')
+
     def __init__(self, mode):
-        self.previous_mode = 'BLOCK'
+        self.previous_mode = MODE_BLOCK
         self.mode = mode
         self.var_line = False
         self.var_line_tainted = False
@@ -92,22 +196,88 @@ def default_options():
     return BeautifierOptions()
 
 
-def beautify(string, opts = default_options() ):
-    b = Beautifier()
-    return b.beautify(string, opts)
+def beautify(string, opts = None):
+    return ''.join(beautify_iter(string, opts))
 
-def beautify_file(file_name, opts = default_options() ):
+def beautify_iter(string, opts = None):
+    opts = opts or default_options()
+    b = Beautifier()
+    # profiled runs have to do the work, they never use the cache
+    if opts.cache_dir and opts.profile is None:
+        import jsbeautifier.cache
+        cache = jsbeautifier.cache.get_cache(opts)
+        key = cache.key(opts, string)
+        f = cache.lookup(key)
+        if f:
+            return cache.read_iter(f, not isinstance(string, bytes))
+        return cache.store_iter(key, b.beautify_iter(string, opts))
+    return b.beautify_iter(string, opts)
+
+def beautify_profile(string, opts = None):
+    # returns the result together with the Profile of the run
+    opts = copy.copy(opts or default_options())
+    profiles = []
+    opts.profile = profiles.append
+    result = beautify(string, opts)
+    return result, profiles[0]
+
+def beautify_json(string, opts = None):
+    # beautify() for input that is most likely JSON: it is tried on the
+    # JSON fast path first, and formatted as javascript if it is not JSON
+    opts = copy.copy(opts or default_options())
+    opts.json = True
+    return beautify(string, opts)
+
+def beautify_file(file_name, opts = None, use_mmap = False):
+    return ''.join(beautify_file_iter(file_name, opts, use_mmap))
+
+def beautify_file_iter(file_name, opts = None, use_mmap = False):
+    return _beautify_file_iter(file_name, opts, use_mmap, False)
+
+def _beautify_file_iter(file_name, opts, use_mmap, strict):
+    # strict: let errors opening the file propagate, instead of giving a
+    # message in place of the output
+
+    opts = opts or default_options()
+    cache = None
+    if opts.cache_dir and opts.profile is None and file_name != '-':
+        import jsbeautifier.cache
+        cache = jsbeautifier.cache.get_cache(opts)
+        try:
+            key = cache.file_key(opts, file_name, use_mmap)
+        except EnvironmentError:
+            cache = None
+        else:
+            f = cache.lookup(key)
+            if f:
+                # files are read as byte strings on Python 2
+                for chunk in cache.read_iter(f, str is not bytes):
+                    yield chunk
+                return
 
     if file_name == '-': # stdin
-        f = sys.stdin
+        source = InputSource(sys.stdin)
     else:
         try:
-            f = open(file_name)
+            if use_mmap:
+                source = MmapInputSource(file_name)
+            else:
+                source = InputSource(open(file_name))
         except Exception as ex:
-            return 'The file could not be opened'
+            if strict:
+                raise
+            yield 'The file could not be opened'
+            return
 
-    b = Beautifier()
-    return b.beautify(''.join(f.readlines()), opts)
+    try:
+        b = Beautifier()
+        chunks = b.beautify_iter(source, opts)
+        if cache:
+            chunks = cache.store_iter(key, chunks)
+        for chunk in chunks:
+            yield chunk
+    finally:
+        source.close()
 
 
 def usage():
@@ -115,13 +285,19 @@ def usage():
     print("""Javascript beautifier (http://jsbeautifier.org/)
 
 Usage: jsbeautifier.py [options] <infile>
+       jsbeautifier.py [options] (--replace | --output-dir=DIR) <infile|dir|glob>...
 
     <infile> can be "-", which means stdin.
     <outfile> defaults to stdout
 
+    Several files, directories (searched for .js and .json files) or glob
+    patterns are beautified in parallel, in place or into a mirror directory.
+
 Input options:
 
  -i,  --stdin                      read input from stdin
+ --mmap                            map <infile> into memory and decode it as UTF-8
+                                   piece by piece instead of reading it.
 
 Output options:
 
@@ -134,6 +310,9 @@ Output options:
  -k,  --keep-array-indentation     keep array indentation.
  -o,  --outfile=FILE               specify a file to output to (default stdout)
  -f,  --keep-function-indentation  Do not re-indent function bodies defined in var lines.
+ -r,  --replace                    write the output in place, replacing the input files.
+      --output-dir=DIR             write the output of each file to its mirror under DIR.
+ -J,  --jobs=NUMBER                worker processes for many files. (default: one per core).
  -x,  --unescape-strings          Decode printable chars encoded in \\xNN notation.
 
 Rarely needed options:
@@ -142,8 +321,26 @@ Rarely needed options:
                                    installed. May be useful with some obfuscated
                                    script but poses a potential security issue.
 
+ --disable-unpacking               format the input as it is, even if it looks packed
+                                   or obfuscated.
+
+ --unpack-depth=NUMBER             unpack input packed several times over, up to NUMBER
+                                   layers deep. (default 1).
+
  -l,  --indent-level=NUMBER        initial indentation level. (default 0).
 
+ --cache-dir=DIR                   keep results in DIR and reuse them for unchanged input.
+ --cache-size=NUMBER               evict least recently used results beyond NUMBER bytes.
+
+ --tokenizer=regex                 tokenizer backend: regex (default) or classic,
+                                   the original character-by-character scanner.
+
+ --json                            format JSON documents on a faster path of their own;
+                                   other input is formatted as javascript.
+
+ --profile                         write the time spent unpacking, tokenizing and in
+                                   each handler, and the token counts, to stderr.
+
  -h,  --help, --usage              prints this help statement.
 
 """)
@@ -153,21 +350,329 @@ Rarely needed options:
 
 
 
-class Beautifier:
+class InputSource:
+    # pull-based reader handing files and stdin to the beautifier in
+    # fixed-size windows, so that they never have to be read in one piece
+
+    def __init__(self, f, window_size = 65536):
+        self.f = f
+        self.window_size = window_size
+
+    def read(self, size = None):
+        return self.f.read(size or self.window_size)
+
+    def read_all(self):
+        return self.f.read()
+
+    def close(self):
+        if self.f is not sys.stdin:
+            self.f.close()
+
+
+class MmapInputSource(InputSource):
+    # maps the file into memory and decodes it as UTF-8 one window at a
+    # time, leaving it to the OS to page the data in. On Python 2 the text
+    # is encoded back to UTF-8 str, the type open() files give there.
+
+    def __init__(self, file_name, window_size = 65536):
+        self.name = file_name
+        self.window_size = window_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.offset = 0
+        with open(file_name, 'rb') as f:
+            try:
+                self.data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+            except ValueError: # empty files cannot be mapped
+                self.data = b''
+
+    def read(self, size = None):
+        chunk = ''
+        # a window may end in the middle of a multibyte character
+        while not chunk and self.offset < len(self.data):
+            chunk = self.decode(size or self.window_size)
+        return chunk
+
+    def read_all(self):
+        return self.decode(len(self.data) - self.offset)
+
+    def decode(self, size):
+        start = self.offset
+        self.offset = min(start + size, len(self.data))
+        pending = len(self.decoder.getstate()[0])
+        try:
+            text = self.decoder.decode(self.data[start:self.offset], self.offset == len(self.data))
+        except UnicodeDecodeError as error:
+            raise InputError('%s: invalid UTF-8 at byte %d' % (self.name, start - pending + error.start))
+        if str is bytes:
+            text = text.encode('utf-8')
+        return text
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+
+class InputError(Exception):
+    pass
+
+
+# the most precise clock available
+clock = getattr(time, 'perf_counter', time.time)
+
+
+class Profile:
+    # what a beautify run spent its time on, collected when
+    # opts.profile is set: seconds per phase ('unpack', 'tokenize', each
+    # handle_* method and 'join'), tokens handled per type and the
+    # deepest the mode stack went
 
-    def __init__(self, opts = default_options() ):
+    def __init__(self):
+        self.times = {}
+        self.tokens = {}
+        self.max_depth = 0
+
+    def add(self, phase, seconds):
+        self.times[phase] = self.times.get(phase, 0) + seconds
+
+    def timed(self, phase, function):
+        def timed_function(*args):
+            start = clock()
+            try:
+                return function(*args)
+            finally:
+                self.add(phase, clock() - start)
+        return timed_function
+
+    def timed_handler(self, beautifier, token_type, handler):
+        phase = handler.__name__
+        name = TOKEN_NAMES[token_type]
+        self.times.setdefault(phase, 0)
+        self.tokens.setdefault(name, 0)
+        def timed_handler(token_text):
+            start = clock()
+            handler(token_text)
+            self.times[phase] += clock() - start
+            self.tokens[name] += 1
+            if len(beautifier.flag_store) > self.max_depth:
+                self.max_depth = len(beautifier.flag_store)
+        return timed_handler
+
+    def total(self):
+        return sum(self.times.values())
+
+    def report(self):
+        total = self.total() or 1
+        lines = ['%-22s %9.4f s %5.1f%%' % (phase, seconds, 100 * seconds / total)
+                 for phase, seconds in sorted(self.times.items(), key = lambda item: -item[1])
+                 if seconds]
+        lines.extend('%-22s %9d' % (name, count)
+                     for name, count in sorted(self.tokens.items()) if count)
+        lines.append('%-22s %9d' % ('max mode stack depth', self.max_depth))
+        return '\n'.join(lines) + '\n'
+
+
+def print_profile(profile):
+    # opts.profile callback of the --profile command line switch
+    sys.stderr.write(profile.report())
+
+
+class Indentation(str):
+    # whitespace the beautifier puts at the start of a line, written as a
+    # single fragment that remembers what it is made of: the preindent or
+    # not, and the number of indent strings after it
+    pass
+
+
+class OutputBuffer(list):
+    # the formatted code, as a list of fragments. The indentation of each
+    # line is one Indentation fragment, taken from a cache by level, which
+    # trim, remove_indent and flush see through as if it still were one
+    # fragment per level.
+
+    def __init__(self, indent_string, preindent_string = ''):
+        list.__init__(self)
+        self.indent_string = indent_string
+        self.preindent_string = preindent_string
+        self.trimmable = frozenset([' ', '\n', '\r', indent_string, preindent_string])
+        self.indentations = {}
+
+    def indentation(self, preindent, level, spaces = 0):
+        # the Indentation for a line: the preindent or not, `level` indent
+        # strings and `spaces` single spaces (keep_array_indentation).
+        # None if there is nothing to indent.
+        key = (preindent, level, spaces)
+        if key not in self.indentations:
+            level = max(level, 0)
+            spaces = max(spaces, 0)
+            if not preindent and not level and not spaces:
+                self.indentations[key] = None
+            else:
+                indentation = Indentation((self.preindent_string if preindent else '') + self.indent_string * level + ' ' * spaces)
+                indentation.preindent = preindent
+                indentation.level = level
+                indentation.spaces = spaces
+                if spaces:
+                    indentation.last = ' '
+                elif level:
+                    indentation.last = self.indent_string
+                else:
+                    indentation.last = self.preindent_string
+                self.indentations[key] = indentation
+        return self.indentations[key]
+
+    def append_indentation(self, preindent, level, spaces = 0):
+        indentation = self.indentation(preindent, level, spaces)
+        if indentation is not None:
+            self.append(indentation)
+
+    def last(self):
+        # the last fragment, as if indentation were appended level by level;
+        # None when empty
+        if not self:
+            return None
+        fragment = self[-1]
+        if type(fragment) is Indentation:
+            return fragment.last
+        return fragment
+
+    def remove_last(self):
+        fragment = self.pop()
+        if type(fragment) is Indentation:
+            if fragment.spaces:
+                self.append_indentation(fragment.preindent, fragment.level, fragment.spaces - 1)
+            elif fragment.level:
+                self.append_indentation(fragment.preindent, fragment.level - 1)
+
+    def trim(self, eat_newlines = False):
+        # drops the trailing spaces and indentation, and newlines if asked to
+        while self \
+              and (
+                  self[-1] == ' '\
+                  or type(self[-1]) is Indentation \
+                  or self[-1] == self.indent_string \
+                  or self[-1] == self.preindent_string \
+                  or (eat_newlines and self[-1] in ['\n', '\r'])):
+            self.pop()
+
+    def flush(self):
+        # everything before the last fragment which neither trim,
+        # remove_indent nor the final whitespace strip may remove is final
+        for i in range(len(self) - 1, 0, -1):
+            fragment = self[i]
+            if type(fragment) is not Indentation and fragment not in self.trimmable \
+                    and fragment.strip('\n '):
+                chunk = ''.join(self[:i])
+                del self[:i]
+                return chunk
+        return ''
+
+    def finish(self):
+        # all that is left, joined in one go, without trailing whitespace
+        chunk = ''.join(self).rstrip('\n ')
+        del self[:]
+        return chunk
+
+
+def punctuator_table(punct):
+    # longest match table for the tokenizers: maps each punctuator to the
+    # characters that extend it into a longer one. Every prefix of a
+    # punctuator is a punctuator too, so a token can grow one character
+    # at a time for as long as the next one is in its entry.
+    table = {}
+    for p in punct:
+        table[p] = frozenset(q[-1] for q in punct if q[:-1] == p)
+    return table
+
+
+class Beautifier:
 
-        self.opts = opts
+    # number of output fragments collected before beautify_iter tries to
+    # hand the finished part over to the caller
+    output_flush_size = 1024
+
+    # characters the tokenizer may need to see past the end of a match
+    input_lookahead = 8
+
+    # compiled patterns for the 'regex' tokenizer: each one matches a whole
+    # token (or its body) in a single call instead of growing it char by char
+    re_whitespace = re.compile('[\n\r\t ]*')
+    re_word = re.compile('[a-zA-Z0-9_$]+')
+    re_word_tail = re.compile('[a-zA-Z0-9_$]*')
+    re_exponent = re.compile('^[0-9]+[Ee]$')
+    re_line = re.compile('[^\r\n]*')
+    re_html_line = re.compile('[^\n]*')
+    # pieces of the body of a string or regexp literal (or of a [...] class
+    # in a regexp, when it is too long to be one item of the regexp body),
+    # matched by scan_literal a bounded number of items at a time: a single
+    # match of the whole body would keep backtracking state for every escape
+    # in it. Classes are matched one character at a time, so that one which
+    # does not close fails in linear time. With unescape_strings, the hex
+    # digits after \x and \u are taken verbatim: a backslash there does not
+    # start a new escape sequence.
+    re_literal_body = {
+        '"': re.compile(r'(?:[^"\\]+|\\[\s\S]){0,256}'),
+        "'": re.compile(r"(?:[^'\\]+|\\[\s\S]){0,256}"),
+        '/': re.compile(r'(?:[^/\\\[]+|\\[\s\S]|\[(?:[^\]\\]|\\[\s\S]){0,64}\]){0,256}'),
+        ']': re.compile(r'(?:[^\]\\]+|\\[\s\S]){0,256}'),
+    }
+    re_unescape_body = {
+        '"': re.compile(r'(?:[^"\\]+|\\x[^"]?|\\u[^"]{0,3}|\\[\s\S]){0,256}'),
+        "'": re.compile(r"(?:[^'\\]+|\\x[^']?|\\u[^']{0,3}|\\[\s\S]){0,256}"),
+    }
+    # splits a string body into text and escape sequences: a full \xNN or
+    # \uNNNN ends on the first backslash, like in re_unescape_body
+    re_unescape_split = {
+        '"': re.compile(r'(\\x[^"]?[^"\\]?|\\u[^"]{0,3}[^"\\]?|\\[\s\S])'),
+        "'": re.compile(r"(\\x[^']?[^'\\]?|\\u[^']{0,3}[^'\\]?|\\[\s\S])"),
+    }
+    re_sharp = re.compile('[^#=]*[#=]?')
+
+    # membership tables for the tokenizers and the handlers
+    whitespace = frozenset('\n\r\t ')
+    wordchar = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_$')
+    digits = frozenset('0123456789')
+    punct = frozenset(('+ - * / % & ++ -- = += -= *= /= %= == === != !== > < >= <= >> << >>> >>>= >>= <<= && &= | || ! !! , : ? ^ ^= |= ::'
+                       ' <?= <? ?> <%= <% %>').split(' '))
+    punct_next = punctuator_table(punct)
+
+    # Words which always should start on a new line
+    line_starters = frozenset('continue,try,throw,return,var,if,switch,case,default,for,while,break,function'.split(','))
+    special_words = frozenset(['case', 'return', 'do', 'if', 'throw', 'else'])
+    array_modes = frozenset([MODE_ARRAY, MODE_INDENTED_ARRAY])
+    expression_modes = frozenset([MODE_ARRAY, MODE_INDENTED_ARRAY, MODE_EXPRESSION, MODE_FOR_EXPRESSION, MODE_COND_EXPRESSION])
+
+    def __init__(self, opts = None):
+
+        self.opts = opts or default_options()
+
+        # dispatch table, in token type order
+        self.handlers = [
+            self.handle_start_expr,
+            self.handle_end_expr,
+            self.handle_start_block,
+            self.handle_end_block,
+            self.handle_word,
+            self.handle_semicolon,
+            self.handle_string,
+            self.handle_equals,
+            self.handle_operator,
+            self.handle_comma,
+            self.handle_block_comment,
+            self.handle_inline_comment,
+            self.handle_comment,
+            self.handle_unknown,
+        ]
         self.blank_state()
 
     def blank_state(self):
 
         # internal flags
-        self.flags = BeautifierFlags('BLOCK')
+        self.flags = BeautifierFlags(MODE_BLOCK)
         self.flag_store = []
         self.wanted_newline = False
         self.just_added_newline = False
         self.do_block_just_closed = False
+        self.n_newlines = 0
 
         if self.opts.indent_with_tabs:
             self.indent_string = "\t"
@@ -176,30 +681,26 @@ class Beautifier:
 
         self.preindent_string = ''
         self.last_word = ''              # last TK_WORD seen
-        self.last_type = 'TK_START_EXPR' # last token type
+        self.last_type = TK_START_EXPR # last token type
         self.last_text = ''              # last token text
         self.last_last_text = ''         # pre-last token text
 
         self.input = None
-        self.output = []                 # formatted javascript gets built here
+        self.input_source = None
+        self.output = OutputBuffer(self.indent_string) # formatted javascript gets built here
 
-        self.whitespace = ["\n", "\r", "\t", " "]
-        self.wordchar = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_$'
-        self.digits = '0123456789'
-        self.punct = '+ - * / % & ++ -- = += -= *= /= %= == === != !== > < >= <= >> << >>> >>>= >>= <<= && &= | || ! !! , : ? ^ ^= |= ::'
-        self.punct += ' <?= <? ?> <%= <% %>'
-        self.punct = self.punct.split(' ')
+        self.set_mode(MODE_BLOCK)
 
+        self.parser_pos = 0
 
-        # Words which always should start on a new line
-        self.line_starters = 'continue,try,throw,return,var,if,switch,case,default,for,while,break,function'.split(',')
-        self.set_mode('BLOCK')
 
-        global parser_pos
-        parser_pos = 0
+    def beautify(self, s, opts = None ):
+        return ''.join(self.beautify_iter(s, opts))
 
 
-    def beautify(self, s, opts = None ):
+    def beautify_iter(self, s, opts = None ):
+        # yields the formatted code in chunks, as soon as no later token
+        # can change them, so the whole result never has to be kept around
 
         if opts != None:
             self.opts = opts
@@ -208,86 +709,152 @@ class Beautifier:
         if self.opts.brace_style not in ['expand', 'collapse', 'end-expand']:
             raise(Exception('opts.brace_style must be "expand", "collapse" or "end-expand".'))
 
+        if self.opts.tokenizer not in ['regex', 'classic']:
+            raise(Exception('opts.tokenizer must be "regex" or "classic".'))
+
         self.blank_state()
 
-        while s and s[0] in [' ', '\t']:
-            self.preindent_string += s[0]
-            s = s[1:]
+        can_unpack, unpack = self.can_unpack, self.unpack
+        profile = None
+        if self.opts.profile is not None:
+            profile = Profile()
+            can_unpack = profile.timed('unpack', can_unpack)
+            unpack = profile.timed('unpack', unpack)
+
+        source = None
+        if isinstance(s, InputSource):
+            source = s
+            # the unpackers pre-scan the start of the input, past the indentation
+            head_size = 1
+            if self.opts.unpack:
+                import jsbeautifier.unpackers
+                head_size = jsbeautifier.unpackers.PRESCAN_SIZE
+            s = source.read()
+            while s and len(s.lstrip(' \t')) < head_size:
+                chunk = source.read()
+                if not chunk:
+                    break
+                s += chunk
+            if self.opts.tokenizer == 'classic' or self.opts.json or can_unpack(s, self.opts.eval_code):
+                # the unpackers, the classic tokenizer and the JSON fast
+                # path need all of the input
+                s += source.read_all()
+                source = None
+
+        stripped = s.lstrip(' \t')
+        self.preindent_string = s[:len(s) - len(stripped)]
+        self.output = OutputBuffer(self.indent_string, self.preindent_string)
+        s = stripped
+
+        if self.opts.json:
+            import jsbeautifier.jsonmode
+            start = clock()
+            result = jsbeautifier.jsonmode.beautify(self, s)
+            if profile is not None:
+                profile.add('json', clock() - start)
+            if result is not None:
+                if self.preindent_string:
+                    yield self.preindent_string
+                if profile is not None:
+                    self.opts.profile(profile)
+                yield result
+                return
+
+        if source is None:
+            self.input = unpack(s, self.opts.eval_code)
+        else:
+            # nothing to unpack, let the tokenizer pull the rest as it goes
+            self.input = s
+            self.input_source = source
 
-        self.input = self.unpack(s, opts.eval_code)
+        if self.opts.tokenizer == 'regex':
+            get_next_token = self.get_next_token_regex
+        else:
+            get_next_token = self.get_next_token
+
+        if self.preindent_string:
+            yield self.preindent_string
 
-        parser_pos = 0
+        handlers = self.handlers
+        flush_output = self.flush_output
+        if profile is not None:
+            get_next_token = profile.timed('tokenize', get_next_token)
+            handlers = [profile.timed_handler(self, token_type, handler)
+                        for token_type, handler in enumerate(handlers)]
+            flush_output = profile.timed('join', flush_output)
+
+        flush_at = self.output_flush_size
         while True:
-            token_text, token_type = self.get_next_token()
-            #print (token_text, token_type, self.flags.mode)
-            if token_type == 'TK_EOF':
+            token_text, token_type = get_next_token()
+            #print (token_text, TOKEN_NAMES[token_type], self.flags.mode)
+            if token_type == TK_EOF:
                 break
 
-            handlers = {
-                'TK_START_EXPR': self.handle_start_expr,
-                'TK_END_EXPR': self.handle_end_expr,
-                'TK_START_BLOCK': self.handle_start_block,
-                'TK_END_BLOCK': self.handle_end_block,
-                'TK_WORD': self.handle_word,
-                'TK_SEMICOLON': self.handle_semicolon,
-                'TK_STRING': self.handle_string,
-                'TK_EQUALS': self.handle_equals,
-                'TK_OPERATOR': self.handle_operator,
-                'TK_COMMA': self.handle_comma,
-                'TK_BLOCK_COMMENT': self.handle_block_comment,
-                'TK_INLINE_COMMENT': self.handle_inline_comment,
-                'TK_COMMENT': self.handle_comment,
-                'TK_UNKNOWN': self.handle_unknown,
-            }
-
             handlers[token_type](token_text)
 
             self.last_last_text = self.last_text
             self.last_type = token_type
             self.last_text = token_text
 
-        sweet_code = self.preindent_string + re.sub('[\n ]+$', '', ''.join(self.output))
-        return sweet_code
+            if len(self.output) >= flush_at:
+                chunk = flush_output()
+                if chunk:
+                    yield chunk
+                flush_at = max(self.output_flush_size, 2 * len(self.output))
+
+        start = clock()
+        chunk = self.output.finish()
+        if profile is not None:
+            profile.add('join', clock() - start)
+            self.opts.profile(profile)
+        yield chunk
+
+
+    def flush_output(self):
+        return self.output.flush()
+
+    def can_unpack(self, source, evalcode=False):
+        # False if the start of the source rules out unpacking it: the rest
+        # can then be streamed. Otherwise unpack() decides on all of it.
+        if not self.opts.unpack:
+            return False
+        import jsbeautifier.unpackers as unpackers
+        return not unpackers.ruled_out(source.lstrip(' \t')[:unpackers.PRESCAN_SIZE], evalcode)
 
     def unpack(self, source, evalcode=False):
+        if not self.opts.unpack:
+            return source
         import jsbeautifier.unpackers as unpackers
         try:
-            return unpackers.run(source, evalcode)
+            return unpackers.run(source, evalcode, self.opts.unpack_depth)
         except unpackers.UnpackingError as error:
             print('error:', error)
             return ''
 
     def trim_output(self, eat_newlines = False):
-        while len(self.output) \
-              and (
-                  self.output[-1] == ' '\
-                  or self.output[-1] == self.indent_string \
-                  or self.output[-1] == self.preindent_string \
-                  or (eat_newlines and self.output[-1] in ['\n', '\r'])):
-            self.output.pop()
+        self.output.trim(eat_newlines)
 
     def is_special_word(self, s):
-        return s in ['case', 'return', 'do', 'if', 'throw', 'else'];
+        return s in self.special_words
 
     def is_array(self, mode):
-        return mode in ['[EXPRESSION]', '[INDENTED-EXPRESSION]']
+        return mode in self.array_modes
 
 
     def is_expression(self, mode):
-        return mode in ['[EXPRESSION]', '[INDENTED-EXPRESSION]', '(EXPRESSION)', '(FOR-EXPRESSION)', '(COND-EXPRESSION)']
+        return mode in self.expression_modes
 
 
     def append_newline_forced(self):
-        old_array_indentation = self.opts.keep_array_indentation
-        self.opts.keep_array_indentation = False
-        self.append_newline()
-        self.opts.keep_array_indentation = old_array_indentation
+        self.append_newline(forced = True)
 
-    def append_newline(self, ignore_repeated = True):
+    def append_newline(self, ignore_repeated = True, forced = False):
 
         self.flags.eat_next_space = False
 
-        if self.opts.keep_array_indentation and self.is_array(self.flags.mode):
+        # opts may be shared between threads, so forcing a newline
+        # must not toggle opts.keep_array_indentation
+        if not forced and self.opts.keep_array_indentation and self.is_array(self.flags.mode):
             return
 
         self.flags.if_line = False
@@ -301,26 +868,23 @@ class Beautifier:
             self.just_added_newline = True
             self.output.append('\n')
 
-        if self.preindent_string:
-            self.output.append(self.preindent_string)
-
-        for i in range(self.flags.indentation_level):
-            self.output.append(self.indent_string)
-
+        # indentation_level goes below zero on a stray 'case'
+        level = max(self.flags.indentation_level, 0)
         if self.flags.var_line and self.flags.var_line_reindented:
-            self.output.append(self.indent_string)
+            level += 1
+        self.output.append_indentation(bool(self.preindent_string), level)
 
 
     def append(self, s):
         if s == ' ':
             # do not add just a single space after the // comment, ever
-            if self.last_type == 'TK_COMMENT':
+            if self.last_type == TK_COMMENT:
                 return self.append_newline()
 
             # make sure only single space gets drawn
             if self.flags.eat_next_space:
                 self.flags.eat_next_space = False
-            elif len(self.output) and self.output[-1] not in [' ', '\n', self.indent_string]:
+            elif self.output.last() not in [None, ' ', '\n', self.indent_string]:
                 self.output.append(' ')
         else:
             self.just_added_newline = False
@@ -333,31 +897,25 @@ class Beautifier:
 
 
     def remove_indent(self):
-        if len(self.output) and self.output[-1] in [self.indent_string, self.preindent_string]:
-            self.output.pop()
+        if self.output.last() in [self.indent_string, self.preindent_string]:
+            self.output.remove_last()
 
 
     def set_mode(self, mode):
 
-        prev = BeautifierFlags('BLOCK')
-
-        if self.flags:
-            self.flag_store.append(self.flags)
-            prev = self.flags
+        prev = self.flags
+        flags = self.flags = BeautifierFlags(mode)
 
-        self.flags = BeautifierFlags(mode)
-
-        if len(self.flag_store) == 1:
-            self.flags.indentation_level = 0
-        else:
-            self.flags.indentation_level = prev.indentation_level
+        self.flag_store.append(prev)
+        if len(self.flag_store) > 1:
+            flags.indentation_level = prev.indentation_level
             if prev.var_line and prev.var_line_reindented:
-                self.flags.indentation_level = self.flags.indentation_level + 1
-        self.flags.previous_mode = prev.mode
+                flags.indentation_level += 1
+        flags.previous_mode = prev.mode
 
 
     def restore_mode(self):
-        self.do_block_just_closed = self.flags.mode == 'DO_BLOCK'
+        self.do_block_just_closed = self.flags.mode == MODE_DO_BLOCK
         if len(self.flag_store) > 0:
             mode = self.flags.mode
             self.flags = self.flag_store.pop()
@@ -366,16 +924,14 @@ class Beautifier:
 
     def get_next_token(self):
 
-        global parser_pos
-
         self.n_newlines = 0
 
-        if parser_pos >= len(self.input):
-            return '', 'TK_EOF'
+        if self.parser_pos >= len(self.input):
+            return '', TK_EOF
 
         self.wanted_newline = False
-        c = self.input[parser_pos]
-        parser_pos += 1
+        c = self.input[self.parser_pos]
+        self.parser_pos += 1
 
         keep_whitespace = self.opts.keep_array_indentation and self.is_array(self.flags.mode)
 
@@ -406,23 +962,21 @@ class Beautifier:
                 else:
                     whitespace_count += 1
 
-                if parser_pos >= len(self.input):
-                    return '', 'TK_EOF'
+                if self.parser_pos >= len(self.input):
+                    return '', TK_EOF
 
-                c = self.input[parser_pos]
-                parser_pos += 1
+                c = self.input[self.parser_pos]
+                self.parser_pos += 1
 
             if self.flags.indentation_baseline == -1:
 
                 self.flags.indentation_baseline = whitespace_count
 
             if self.just_added_newline:
-                for i in range(self.flags.indentation_level + 1):
-                    self.output.append(self.indent_string)
-
+                spaces = 0
                 if self.flags.indentation_baseline != -1:
-                    for i in range(whitespace_count - self.flags.indentation_baseline):
-                        self.output.append(' ')
+                    spaces = whitespace_count - self.flags.indentation_baseline
+                self.output.append_indentation(False, self.flags.indentation_level + 1, spaces)
 
         else: # not keep_whitespace
             while c in self.whitespace:
@@ -430,11 +984,11 @@ class Beautifier:
                     if self.opts.max_preserve_newlines == 0 or self.opts.max_preserve_newlines > self.n_newlines:
                         self.n_newlines += 1
 
-                if parser_pos >= len(self.input):
-                    return '', 'TK_EOF'
+                if self.parser_pos >= len(self.input):
+                    return '', TK_EOF
 
-                c = self.input[parser_pos]
-                parser_pos += 1
+                c = self.input[self.parser_pos]
+                self.parser_pos += 1
 
             if self.opts.preserve_newlines and self.n_newlines > 1:
                 for i in range(self.n_newlines):
@@ -445,88 +999,73 @@ class Beautifier:
 
 
         if c in self.wordchar:
-            if parser_pos < len(self.input):
-                while self.input[parser_pos] in self.wordchar:
-                    c = c + self.input[parser_pos]
-                    parser_pos += 1
-                    if parser_pos == len(self.input):
+            if self.parser_pos < len(self.input):
+                while self.input[self.parser_pos] in self.wordchar:
+                    c = c + self.input[self.parser_pos]
+                    self.parser_pos += 1
+                    if self.parser_pos == len(self.input):
                         break
 
             # small and surprisingly unugly hack for 1E-10 representation
-            if parser_pos != len(self.input) and self.input[parser_pos] in '+-' \
+            if self.parser_pos != len(self.input) and self.input[self.parser_pos] in '+-' \
                and re.match('^[0-9]+[Ee]$', c):
 
-                sign = self.input[parser_pos]
-                parser_pos += 1
+                sign = self.input[self.parser_pos]
+                self.parser_pos += 1
                 t = self.get_next_token()
                 c += sign + t[0]
-                return c, 'TK_WORD'
+                return c, TK_WORD
 
             if c == 'in': # in is an operator, need to hack
-                return c, 'TK_OPERATOR'
+                return c, TK_OPERATOR
 
             if self.wanted_newline and \
-               self.last_type != 'TK_OPERATOR' and\
-               self.last_type != 'TK_EQUALS' and\
+               self.last_type != TK_OPERATOR and\
+               self.last_type != TK_EQUALS and\
                not self.flags.if_line and \
                (self.opts.preserve_newlines or self.last_text != 'var'):
                 self.append_newline()
 
-            return c, 'TK_WORD'
+            return c, TK_WORD
 
         if c in '([':
-            return c, 'TK_START_EXPR'
+            return c, TK_START_EXPR
 
         if c in ')]':
-            return c, 'TK_END_EXPR'
+            return c, TK_END_EXPR
 
         if c == '{':
-            return c, 'TK_START_BLOCK'
+            return c, TK_START_BLOCK
 
         if c == '}':
-            return c, 'TK_END_BLOCK'
+            return c, TK_END_BLOCK
 
         if c == ';':
-            return c, 'TK_SEMICOLON'
+            return c, TK_SEMICOLON
 
         if c == '/':
-            comment = ''
-            inline_comment = True
-            comment_mode = 'TK_INLINE_COMMENT'
-            if self.input[parser_pos] == '*': # peek /* .. */ comment
-                parser_pos += 1
-                if parser_pos < len(self.input):
-                    while not (self.input[parser_pos] == '*' and \
-                               parser_pos + 1 < len(self.input) and \
-                               self.input[parser_pos + 1] == '/')\
-                          and parser_pos < len(self.input):
-                        c = self.input[parser_pos]
-                        comment += c
-                        if c in '\r\n':
-                            comment_mode = 'TK_BLOCK_COMMENT'
-                        parser_pos += 1
-                        if parser_pos >= len(self.input):
-                            break
-                parser_pos += 2
-                return '/*' + comment + '*/', comment_mode
-            if self.input[parser_pos] == '/': # peek // comment
-                comment = c
-                while self.input[parser_pos] not in '\r\n':
-                    comment += self.input[parser_pos]
-                    parser_pos += 1
-                    if parser_pos >= len(self.input):
-                        break
+            if self.input[self.parser_pos] == '*': # peek /* .. */ comment
+                start = self.parser_pos + 1
+                end = self.input.find('*/', start)
+                if end == -1:
+                    end = len(self.input)
+                comment = self.input[start:end]
+                self.parser_pos = end + 2
+                return '/*' + comment + '*/', self.comment_type(comment)
+            if self.input[self.parser_pos] == '/': # peek // comment
+                m = self.re_line.match(self.input, self.parser_pos)
+                self.parser_pos = m.end()
                 if self.wanted_newline:
                     self.append_newline()
-                return comment, 'TK_COMMENT'
+                return c + m.group(0), TK_COMMENT
 
 
 
         if c == "'" or c == '"' or \
-           (c == '/' and ((self.last_type == 'TK_WORD' and self.is_special_word(self.last_text)) or \
-                          (self.last_type == 'TK_END_EXPR' and self.flags.previous_mode in ['(FOR-EXPRESSION)', '(COND-EXPRESSION)']) or \
-                          (self.last_type in ['TK_COMMENT', 'TK_START_EXPR', 'TK_START_BLOCK', 'TK_END_BLOCK', 'TK_OPERATOR',
-                                              'TK_EQUALS', 'TK_EOF', 'TK_SEMICOLON', 'TK_COMMA']))):
+           (c == '/' and ((self.last_type == TK_WORD and self.is_special_word(self.last_text)) or \
+                          (self.last_type == TK_END_EXPR and self.flags.previous_mode in [MODE_FOR_EXPRESSION, MODE_COND_EXPRESSION]) or \
+                          (self.last_type in [TK_COMMENT, TK_START_EXPR, TK_START_BLOCK, TK_END_BLOCK, TK_OPERATOR,
+                                              TK_EQUALS, TK_EOF, TK_SEMICOLON, TK_COMMA]))):
             sep = c
             esc = False
             esc1 = 0
@@ -534,79 +1073,82 @@ class Beautifier:
             resulting_string = c
             in_char_class = False
 
-            if parser_pos < len(self.input):
+            if self.parser_pos < len(self.input):
                 if sep == '/':
                     # handle regexp
                     in_char_class = False
-                    while esc or in_char_class or self.input[parser_pos] != sep:
-                        resulting_string += self.input[parser_pos]
+                    while esc or in_char_class or self.input[self.parser_pos] != sep:
+                        resulting_string += self.input[self.parser_pos]
                         if not esc:
-                            esc = self.input[parser_pos] == '\\'
-                            if self.input[parser_pos] == '[':
+                            esc = self.input[self.parser_pos] == '\\'
+                            if self.input[self.parser_pos] == '[':
                                 in_char_class = True
-                            elif self.input[parser_pos] == ']':
+                            elif self.input[self.parser_pos] == ']':
                                 in_char_class = False
                         else:
                             esc = False
-                        parser_pos += 1
-                        if parser_pos >= len(self.input):
+                        self.parser_pos += 1
+                        if self.parser_pos >= len(self.input):
                             # incomplete regex when end-of-file reached
                             # bail out with what has received so far
-                            return resulting_string, 'TK_STRING'
+                            return resulting_string, TK_STRING
                 else:
-                    # handle string
-                    while esc or self.input[parser_pos] != sep:
-                        resulting_string += self.input[parser_pos]
+                    # handle string, one character per item of chars so that
+                    # decoding an escape does not copy all that came before
+                    chars = [c]
+                    while esc or self.input[self.parser_pos] != sep:
+                        chars.append(self.input[self.parser_pos])
                         if esc1 and esc1 >= esc2:
                             try:
-                                esc1 = int(resulting_string[-esc2:], 16)
+                                esc1 = int(''.join(chars[-esc2:]), 16)
                             except Exception:
                                 esc1 = False
                             if esc1 and esc1 >= 0x20 and esc1 <= 0x7e:
                                 esc1 = chr(esc1)
-                                resulting_string = resulting_string[:-2 - esc2]
+                                del chars[-2 - esc2:]
                                 if esc1 == sep or esc1 == '\\':
-                                        resulting_string += '\\'
-                                resulting_string += esc1
+                                        chars.append('\\')
+                                chars.append(esc1)
                             esc1 = 0
                         if esc1:
                             esc1 += 1
                         elif not esc:
-                            esc = self.input[parser_pos] == '\\'
+                            esc = self.input[self.parser_pos] == '\\'
                         else:
                             esc = False
                             if self.opts.unescape_strings:
-                                if self.input[parser_pos] == 'x':
+                                if self.input[self.parser_pos] == 'x':
                                     esc1 += 1
                                     esc2 = 2
-                                elif self.input[parser_pos] == 'u':
+                                elif self.input[self.parser_pos] == 'u':
                                     esc1 += 1
                                     esc2 = 4
-                        parser_pos += 1
-                        if parser_pos >= len(self.input):
+                        self.parser_pos += 1
+                        if self.parser_pos >= len(self.input):
                             # incomplete string when end-of-file reached
                             # bail out with what has received so far
-                            return resulting_string, 'TK_STRING'
+                            return ''.join(chars), TK_STRING
+                    resulting_string = ''.join(chars)
 
 
-            parser_pos += 1
+            self.parser_pos += 1
             resulting_string += sep
             if sep == '/':
                 # regexps may have modifiers /regexp/MOD, so fetch those too
-                while parser_pos < len(self.input) and self.input[parser_pos] in self.wordchar:
-                    resulting_string += self.input[parser_pos]
-                    parser_pos += 1
-            return resulting_string, 'TK_STRING'
+                while self.parser_pos < len(self.input) and self.input[self.parser_pos] in self.wordchar:
+                    resulting_string += self.input[self.parser_pos]
+                    self.parser_pos += 1
+            return resulting_string, TK_STRING
 
         if c == '#':
 
             # she-bang
-            if len(self.output) == 0 and len(self.input) > 1 and self.input[parser_pos] == '!':
+            if len(self.output) == 0 and len(self.input) > 1 and self.input[self.parser_pos] == '!':
                 resulting_string = c
-                while parser_pos < len(self.input) and c != '\n':
-                    c = self.input[parser_pos]
+                while self.parser_pos < len(self.input) and c != '\n':
+                    c = self.input[self.parser_pos]
                     resulting_string += c
-                    parser_pos += 1
+                    self.parser_pos += 1
                 self.output.append(resulting_string.strip() + "\n")
                 self.append_newline()
                 return self.get_next_token()
@@ -616,104 +1158,422 @@ class Beautifier:
             # https://developer.mozilla.org/En/Sharp_variables_in_JavaScript
             # http://mxr.mozilla.org/mozilla-central/source/js/src/jsscan.cpp around line 1935
             sharp = '#'
-            if parser_pos < len(self.input) and self.input[parser_pos] in self.digits:
+            if self.parser_pos < len(self.input) and self.input[self.parser_pos] in self.digits:
                 while True:
-                    c = self.input[parser_pos]
+                    c = self.input[self.parser_pos]
                     sharp += c
-                    parser_pos += 1
-                    if parser_pos >= len(self.input)  or c == '#' or c == '=':
+                    self.parser_pos += 1
+                    if self.parser_pos >= len(self.input)  or c == '#' or c == '=':
                         break
-            if c == '#' or parser_pos >= len(self.input):
+            if c == '#' or self.parser_pos >= len(self.input):
                 pass
-            elif self.input[parser_pos] == '[' and self.input[parser_pos + 1] == ']':
+            elif self.input[self.parser_pos] == '[' and self.input[self.parser_pos + 1] == ']':
                 sharp += '[]'
-                parser_pos += 2
-            elif self.input[parser_pos] == '{' and self.input[parser_pos + 1] == '}':
+                self.parser_pos += 2
+            elif self.input[self.parser_pos] == '{' and self.input[self.parser_pos + 1] == '}':
                 sharp += '{}'
-                parser_pos += 2
-            return sharp, 'TK_WORD'
+                self.parser_pos += 2
+            return sharp, TK_WORD
 
-        if c == '<' and self.input[parser_pos - 1 : parser_pos + 3] == '<!--':
-            parser_pos += 3
+        if c == '<' and self.input[self.parser_pos - 1 : self.parser_pos + 3] == '<!--':
+            self.parser_pos += 3
             c = '<!--'
-            while parser_pos < len(self.input) and self.input[parser_pos] != '\n':
-                c += self.input[parser_pos]
-                parser_pos += 1
+            while self.parser_pos < len(self.input) and self.input[self.parser_pos] != '\n':
+                c += self.input[self.parser_pos]
+                self.parser_pos += 1
             self.flags.in_html_comment = True
-            return c, 'TK_COMMENT'
+            return c, TK_COMMENT
 
-        if c == '-' and self.flags.in_html_comment and self.input[parser_pos - 1 : parser_pos + 2] == '-->':
+        if c == '-' and self.flags.in_html_comment and self.input[self.parser_pos - 1 : self.parser_pos + 2] == '-->':
             self.flags.in_html_comment = False
-            parser_pos += 2
+            self.parser_pos += 2
             if self.wanted_newline:
                 self.append_newline()
-            return '-->', 'TK_COMMENT'
+            return '-->', TK_COMMENT
 
         if c in self.punct:
-            while parser_pos < len(self.input) and c + self.input[parser_pos] in self.punct:
-                c += self.input[parser_pos]
-                parser_pos += 1
-                if parser_pos >= len(self.input):
-                    break
+            while self.parser_pos < len(self.input) and self.input[self.parser_pos] in self.punct_next[c]:
+                c += self.input[self.parser_pos]
+                self.parser_pos += 1
+            if c == '=':
+                return c, TK_EQUALS
+
+            if c == ',':
+                return c, TK_COMMA
+            return c, TK_OPERATOR
+
+        return c, TK_UNKNOWN
+
+
+    def get_next_token_regex(self):
+        # same tokens and side effects as get_next_token, but every token is
+        # matched as a whole with the precompiled patterns above
+
+        self.n_newlines = 0
+
+        if self.input_source is not None:
+            if self.parser_pos >= self.input_source.window_size:
+                # drop the consumed part of the window
+                self.input = self.input[self.parser_pos:]
+                self.parser_pos = 0
+            self.fill_input(1)
+
+        if self.parser_pos >= len(self.input):
+            return '', TK_EOF
+
+        self.wanted_newline = False
+
+        m = self.match_input(self.re_whitespace, self.parser_pos)
+        whitespace = m.group(0)
+        self.parser_pos = m.end()
+
+        if self.opts.keep_array_indentation and self.is_array(self.flags.mode):
+            # see get_next_token for the description of indentation_baseline
+            whitespace_count = 0
+            if whitespace:
+                lines = whitespace.split('\n')
+                for i in range(len(lines) - 1):
+                    self.trim_output()
+                    self.output.append('\n')
+                    self.just_added_newline = True
+                whitespace_count = lines[-1].count('\t') * 4 + lines[-1].count(' ')
+
+                if self.parser_pos >= len(self.input):
+                    return '', TK_EOF
+
+            if self.flags.indentation_baseline == -1:
+                self.flags.indentation_baseline = whitespace_count
+
+            if self.just_added_newline:
+                spaces = 0
+                if self.flags.indentation_baseline != -1:
+                    spaces = whitespace_count - self.flags.indentation_baseline
+                self.output.append_indentation(False, self.flags.indentation_level + 1, spaces)
+
+        elif whitespace:
+            newlines = whitespace.count('\n')
+            max_newlines = self.opts.max_preserve_newlines
+            if max_newlines == 0:
+                self.n_newlines = newlines
+            elif max_newlines > 0:
+                self.n_newlines = min(newlines, int(math.ceil(max_newlines)))
+
+            if self.parser_pos >= len(self.input):
+                return '', TK_EOF
+
+            if self.opts.preserve_newlines and self.n_newlines > 1:
+                for i in range(self.n_newlines):
+                    self.append_newline(i == 0)
+                    self.just_added_newline = True
+
+            self.wanted_newline = self.n_newlines > 0
+
+        # the longest peek after c is at '<!--' and '>>>='
+        self.fill_input(4)
+        c = self.input[self.parser_pos]
+
+        if c in self.wordchar:
+            m = self.match_input(self.re_word, self.parser_pos)
+            c = m.group(0)
+            self.parser_pos = m.end()
+
+            # small and surprisingly unugly hack for 1E-10 representation
+            if self.parser_pos != len(self.input) and self.input[self.parser_pos] in '+-' \
+               and self.re_exponent.match(c):
+
+                sign = self.input[self.parser_pos]
+                self.parser_pos += 1
+                t = self.get_next_token_regex()
+                c += sign + t[0]
+                return c, TK_WORD
+
+            if c == 'in': # in is an operator, need to hack
+                return c, TK_OPERATOR
+
+            if self.wanted_newline and \
+               self.last_type != TK_OPERATOR and\
+               self.last_type != TK_EQUALS and\
+               not self.flags.if_line and \
+               (self.opts.preserve_newlines or self.last_text != 'var'):
+                self.append_newline()
+
+            return c, TK_WORD
+
+        self.parser_pos += 1
+
+        if c in '([':
+            return c, TK_START_EXPR
+
+        if c in ')]':
+            return c, TK_END_EXPR
+
+        if c == '{':
+            return c, TK_START_BLOCK
+
+        if c == '}':
+            return c, TK_END_BLOCK
+
+        if c == ';':
+            return c, TK_SEMICOLON
+
+        if c == '/' and self.parser_pos < len(self.input):
+            if self.input[self.parser_pos] == '*': # /* .. */ comment
+                start = self.parser_pos + 1
+                end = self.find_input('*/', start)
+                if end == -1:
+                    comment = self.input[start:]
+                    self.parser_pos = len(self.input)
+                else:
+                    comment = self.input[start:end]
+                    self.parser_pos = end + 2
+                return '/*' + comment + '*/', self.comment_type(comment)
+            if self.input[self.parser_pos] == '/': # // comment
+                m = self.match_input(self.re_line, self.parser_pos)
+                self.parser_pos = m.end()
+                if self.wanted_newline:
+                    self.append_newline()
+                return c + m.group(0), TK_COMMENT
+
+        if c == "'" or c == '"' or \
+           (c == '/' and ((self.last_type == TK_WORD and self.is_special_word(self.last_text)) or \
+                          (self.last_type == TK_END_EXPR and self.flags.previous_mode in [MODE_FOR_EXPRESSION, MODE_COND_EXPRESSION]) or \
+                          (self.last_type in [TK_COMMENT, TK_START_EXPR, TK_START_BLOCK, TK_END_BLOCK, TK_OPERATOR,
+                                              TK_EQUALS, TK_EOF, TK_SEMICOLON, TK_COMMA]))):
+            sep = c
+            start = self.parser_pos - 1
+
+            if self.parser_pos >= len(self.input):
+                self.parser_pos += 1
+                return c + sep, TK_STRING
+
+            self.parser_pos = self.scan_literal(self.parser_pos, sep,
+                                                sep != '/' and self.opts.unescape_strings)
+            if self.parser_pos >= len(self.input) or self.input[self.parser_pos] != sep:
+                # incomplete string or regexp when end-of-file reached
+                # bail out with what has received so far
+                resulting_string = self.input[start:]
+                self.parser_pos = len(self.input)
+                if sep != '/' and self.opts.unescape_strings:
+                    resulting_string = self.unescape_string(resulting_string, sep)
+                return resulting_string, TK_STRING
+
+            self.parser_pos += 1
+            if sep == '/':
+                # regexps may have modifiers /regexp/MOD, so fetch those too
+                self.parser_pos = self.match_input(self.re_word_tail, self.parser_pos).end()
+                return self.input[start:self.parser_pos], TK_STRING
+            if self.opts.unescape_strings:
+                return self.unescape_string(self.input[start:self.parser_pos - 1], sep) + sep, TK_STRING
+            return self.input[start:self.parser_pos], TK_STRING
+
+        if c == '#':
+
+            # she-bang
+            if len(self.output) == 0 and self.parser_pos < len(self.input) and self.input[self.parser_pos] == '!':
+                end = self.find_input('\n', self.parser_pos)
+                if end == -1:
+                    end = len(self.input)
+                else:
+                    end += 1
+                resulting_string = self.input[self.parser_pos - 1:end]
+                self.parser_pos = end
+                self.output.append(resulting_string.strip() + "\n")
+                self.append_newline()
+                return self.get_next_token_regex()
+
+            # Spidermonkey-specific sharp variables for circular references
+            sharp = '#'
+            if self.parser_pos < len(self.input) and self.input[self.parser_pos] in self.digits:
+                m = self.match_input(self.re_sharp, self.parser_pos)
+                sharp += m.group(0)
+                self.parser_pos = m.end()
+                self.fill_input(2)
+                if self.parser_pos < len(self.input) and sharp[-1] == '=':
+                    if self.input[self.parser_pos:self.parser_pos + 2] in ['[]', '{}']:
+                        sharp += self.input[self.parser_pos:self.parser_pos + 2]
+                        self.parser_pos += 2
+            return sharp, TK_WORD
+
+        if c == '<' and self.input.startswith('<!--', self.parser_pos - 1):
+            m = self.match_input(self.re_html_line, self.parser_pos + 3)
+            self.parser_pos = m.end()
+            self.flags.in_html_comment = True
+            return '<!--' + m.group(0), TK_COMMENT
+
+        if c == '-' and self.flags.in_html_comment and self.input.startswith('-->', self.parser_pos - 1):
+            self.flags.in_html_comment = False
+            self.parser_pos += 2
+            if self.wanted_newline:
+                self.append_newline()
+            return '-->', TK_COMMENT
+
+        if c in self.punct:
+            punct_next = self.punct_next
+            while self.parser_pos < len(self.input) and self.input[self.parser_pos] in punct_next[c]:
+                c += self.input[self.parser_pos]
+                self.parser_pos += 1
             if c == '=':
-                return c, 'TK_EQUALS'
+                return c, TK_EQUALS
 
             if c == ',':
-                return c, 'TK_COMMA'
-            return c, 'TK_OPERATOR'
+                return c, TK_COMMA
+            return c, TK_OPERATOR
+
+        return c, TK_UNKNOWN
+
+
+    def comment_type(self, comment):
+        # /* .. */ comments spanning several lines are block comments; two
+        # substring tests (memchr) beat any single pass regex search here
+        if '\n' in comment or '\r' in comment:
+            return TK_BLOCK_COMMENT
+        return TK_INLINE_COMMENT
+
+
+    def read_input(self, size = 0):
+        # appends the next window of the input source to self.input,
+        # returns False once there is nothing left to read
+        if self.input_source is None:
+            return False
+        chunk = self.input_source.read(max(size, self.input_source.window_size))
+        if not chunk:
+            self.input_source = None
+            return False
+        self.input += chunk
+        return True
+
+
+    def fill_input(self, lookahead):
+        while len(self.input) - self.parser_pos < lookahead and self.read_input():
+            pass
+
+
+    def match_input(self, pattern, pos):
+        # a match ending near the end of the window may have stopped at an
+        # escape sequence cut in half: read more (growing geometrically) and
+        # match again, until it ends well inside the window
+        m = pattern.match(self.input, pos)
+        while len(self.input) - m.end() < self.input_lookahead and self.read_input(len(self.input) - pos):
+            m = pattern.match(self.input, pos)
+        return m
+
+
+    def scan_literal(self, pos, sep, unescape_strings=False):
+        # the end of the body of a string or regexp literal starting at pos:
+        # its closing sep, or the end of the input
+        start = pos
+        in_class = self.re_literal_body[']']
+        if unescape_strings:
+            body = self.re_unescape_body[sep]
+        else:
+            body = self.re_literal_body[sep]
+        while True:
+            m = body.match(self.input, pos)
+            # an escape sequence may be cut in half at the end of the
+            # window: read more and match the same items again
+            if len(self.input) - m.end() < self.input_lookahead and \
+               self.read_input(len(self.input) - start):
+                continue
+            pos = m.end()
+            if pos >= len(self.input):
+                return pos
+            c = self.input[pos]
+            if c == '\\' and pos + 1 == len(self.input):
+                # a backslash ending the input
+                return pos
+            if body is in_class:
+                if c == ']':
+                    body = self.re_literal_body['/']
+                    pos += 1
+            elif c == sep:
+                return pos
+            elif c == '[' and sep == '/':
+                body = in_class
+                pos += 1
+            # anything else: the match stopped at its item limit
+
+
+    def find_input(self, s, pos):
+        found = self.input.find(s, pos)
+        while found == -1 and self.input_source is not None:
+            searched = max(pos, len(self.input) - len(s) + 1)
+            if not self.read_input(len(self.input) - pos):
+                break
+            found = self.input.find(s, searched)
+        return found
 
-        return c, 'TK_UNKNOWN'
 
+    def unescape_string(self, s, sep):
+        # decodes printable \xNN and \uNNNN escapes of a string token in bulk:
+        # one split of the body, then each distinct escape is decoded once
+        parts = self.re_unescape_split[sep].split(s[1:])
+        escapes = parts[1::2]
+        decoded = dict((escape, self.unescape(escape, sep)) for escape in set(escapes))
+        parts[1::2] = [decoded[escape] for escape in escapes]
+        return s[0] + ''.join(parts)
+
+
+    def unescape(self, escape, sep):
+        if (escape[1] == 'x' and len(escape) == 4) or (escape[1] == 'u' and len(escape) == 6):
+            try:
+                value = int(escape[2:], 16)
+            except Exception:
+                value = 0
+            if value >= 0x20 and value <= 0x7e:
+                if chr(value) in [sep, '\\']:
+                    return '\\' + chr(value)
+                return chr(value)
+        return escape
 
 
     def handle_start_expr(self, token_text):
         if token_text == '[':
-            if self.last_type == 'TK_WORD' or self.last_text == ')':
+            if self.last_type == TK_WORD or self.last_text == ')':
                 if self.last_text in self.line_starters:
                     self.append(' ')
-                self.set_mode('(EXPRESSION)')
+                self.set_mode(MODE_EXPRESSION)
                 self.append(token_text)
                 return
 
-            if self.flags.mode in ['[EXPRESSION]', '[INDENTED-EXPRESSION]']:
+            if self.flags.mode in [MODE_ARRAY, MODE_INDENTED_ARRAY]:
                 if self.last_last_text == ']' and self.last_text == ',':
                     # ], [ goes to a new line
-                    if self.flags.mode == '[EXPRESSION]':
-                        self.flags.mode = '[INDENTED-EXPRESSION]'
+                    if self.flags.mode == MODE_ARRAY:
+                        self.flags.mode = MODE_INDENTED_ARRAY
                         if not self.opts.keep_array_indentation:
                             self.indent()
-                    self.set_mode('[EXPRESSION]')
+                    self.set_mode(MODE_ARRAY)
                     if not self.opts.keep_array_indentation:
                         self.append_newline()
                 elif self.last_text == '[':
-                    if self.flags.mode == '[EXPRESSION]':
-                        self.flags.mode = '[INDENTED-EXPRESSION]'
+                    if self.flags.mode == MODE_ARRAY:
+                        self.flags.mode = MODE_INDENTED_ARRAY
                         if not self.opts.keep_array_indentation:
                             self.indent()
-                    self.set_mode('[EXPRESSION]')
+                    self.set_mode(MODE_ARRAY)
 
                     if not self.opts.keep_array_indentation:
                         self.append_newline()
                 else:
-                    self.set_mode('[EXPRESSION]')
+                    self.set_mode(MODE_ARRAY)
             else:
-                self.set_mode('[EXPRESSION]')
+                self.set_mode(MODE_ARRAY)
         else:
             if self.last_text == 'for':
-                self.set_mode('(FOR-EXPRESSION)')
+                self.set_mode(MODE_FOR_EXPRESSION)
             elif self.last_text in ['if', 'while']:
-                self.set_mode('(COND-EXPRESSION)')
+                self.set_mode(MODE_COND_EXPRESSION)
             else:
-                self.set_mode('(EXPRESSION)')
+                self.set_mode(MODE_EXPRESSION)
 
 
-        if self.last_text == ';' or self.last_type == 'TK_START_BLOCK':
+        if self.last_text == ';' or self.last_type == TK_START_BLOCK:
             self.append_newline()
-        elif self.last_type in ['TK_END_EXPR', 'TK_START_EXPR', 'TK_END_BLOCK'] or self.last_text == '.':
+        elif self.last_type in [TK_END_EXPR, TK_START_EXPR, TK_END_BLOCK] or self.last_text == '.':
             # do nothing on (( and )( and ][ and ]( and .(
             if self.wanted_newline:
                 self.append_newline();
-        elif self.last_type not in ['TK_WORD', 'TK_OPERATOR']:
+        elif self.last_type not in [TK_WORD, TK_OPERATOR]:
             self.append(' ')
         elif self.last_word == 'function' or self.last_word == 'typeof':
             # function() vs function (), typeof() vs typeof ()
@@ -734,7 +1594,7 @@ class Beautifier:
                     self.restore_mode()
                     return
             else:
-                if self.flags.mode == '[INDENTED-EXPRESSION]':
+                if self.flags.mode == MODE_INDENTED_ARRAY:
                     if self.last_text == ']':
                         self.restore_mode()
                         self.append_newline()
@@ -746,12 +1606,12 @@ class Beautifier:
 
     def handle_start_block(self, token_text):
         if self.last_word == 'do':
-            self.set_mode('DO_BLOCK')
+            self.set_mode(MODE_DO_BLOCK)
         else:
-            self.set_mode('BLOCK')
+            self.set_mode(MODE_BLOCK)
 
         if self.opts.brace_style == 'expand':
-            if self.last_type != 'TK_OPERATOR':
+            if self.last_type != TK_OPERATOR:
                 if self.last_text == '=' or (self.is_special_word(self.last_text) and self.last_text != 'else'):
                     self.append(' ')
                 else:
@@ -760,8 +1620,8 @@ class Beautifier:
             self.append(token_text)
             self.indent()
         else:
-            if self.last_type not in ['TK_OPERATOR', 'TK_START_EXPR']:
-                if self.last_type == 'TK_START_BLOCK':
+            if self.last_type not in [TK_OPERATOR, TK_START_EXPR]:
+                if self.last_type == TK_START_BLOCK:
                     self.append_newline()
                 else:
                     self.append(' ')
@@ -782,7 +1642,7 @@ class Beautifier:
             if self.last_text != '{':
                 self.append_newline()
         else:
-            if self.last_type == 'TK_START_BLOCK':
+            if self.last_type == TK_START_BLOCK:
                 if self.just_added_newline:
                     self.remove_indent()
                 else:
@@ -790,9 +1650,7 @@ class Beautifier:
                     self.trim_output()
             else:
                 if self.is_array(self.flags.mode) and self.opts.keep_array_indentation:
-                    self.opts.keep_array_indentation = False
-                    self.append_newline()
-                    self.opts.keep_array_indentation = True
+                    self.append_newline_forced()
                 else:
                     self.append_newline()
 
@@ -822,15 +1680,15 @@ class Beautifier:
                 for i in range(2 - have_newlines):
                     self.append_newline(False)
 
-            if self.last_text in ['get', 'set', 'new'] or self.last_type == 'TK_WORD':
+            if self.last_text in ['get', 'set', 'new'] or self.last_type == TK_WORD:
                 self.append(' ')
 
-            if self.last_type == 'TK_WORD':
+            if self.last_type == TK_WORD:
                 if self.last_text in ['get', 'set', 'new', 'return']:
                     self.append(' ')
                 else:
                     self.append_newline()
-            elif self.last_type == 'TK_OPERATOR' or self.last_text == '=':
+            elif self.last_type == TK_OPERATOR or self.last_text == '=':
                 # foo = function
                 self.append(' ')
             elif self.is_expression(self.flags.mode):
@@ -857,7 +1715,7 @@ class Beautifier:
 
         prefix = 'NONE'
 
-        if self.last_type == 'TK_END_BLOCK':
+        if self.last_type == TK_END_BLOCK:
             if token_text not in ['else', 'catch', 'finally']:
                 prefix = 'NEWLINE'
             else:
@@ -866,25 +1724,25 @@ class Beautifier:
                 else:
                     prefix = 'SPACE'
                     self.append(' ')
-        elif self.last_type == 'TK_SEMICOLON' and self.flags.mode in ['BLOCK', 'DO_BLOCK']:
+        elif self.last_type == TK_SEMICOLON and self.flags.mode in [MODE_BLOCK, MODE_DO_BLOCK]:
             prefix = 'NEWLINE'
-        elif self.last_type == 'TK_SEMICOLON' and self.is_expression(self.flags.mode):
+        elif self.last_type == TK_SEMICOLON and self.is_expression(self.flags.mode):
             prefix = 'SPACE'
-        elif self.last_type == 'TK_STRING':
+        elif self.last_type == TK_STRING:
             prefix = 'NEWLINE'
-        elif self.last_type == 'TK_WORD':
+        elif self.last_type == TK_WORD:
             if self.last_text == 'else':
                 # eat newlines between ...else *** some_op...
                 # won't preserve extra newlines in this place (if any), but don't care that much
                 self.trim_output(True)
             prefix = 'SPACE'
-        elif self.last_type == 'TK_START_BLOCK':
+        elif self.last_type == TK_START_BLOCK:
             prefix = 'NEWLINE'
-        elif self.last_type == 'TK_END_EXPR':
+        elif self.last_type == TK_END_EXPR:
             self.append(' ')
             prefix = 'NEWLINE'
 
-        if self.flags.if_line and self.last_type == 'TK_END_EXPR':
+        if self.flags.if_line and self.last_type == TK_END_EXPR:
             self.flags.if_line = False
 
         if token_text in self.line_starters:
@@ -894,7 +1752,7 @@ class Beautifier:
                 prefix = 'NEWLINE'
 
         if token_text in ['else', 'catch', 'finally']:
-            if self.last_type != 'TK_END_BLOCK' \
+            if self.last_type != TK_END_BLOCK \
                or self.opts.brace_style == 'expand' \
                or self.opts.brace_style == 'end-expand':
                 self.append_newline()
@@ -905,8 +1763,8 @@ class Beautifier:
             if self.is_special_word(self.last_text):
                 # no newline between return nnn
                 self.append(' ')
-            elif self.last_type != 'TK_END_EXPR':
-                if (self.last_type != 'TK_START_EXPR' or token_text != 'var') and self.last_text != ':':
+            elif self.last_type != TK_END_EXPR:
+                if (self.last_type != TK_START_EXPR or token_text != 'var') and self.last_text != ':':
                     # no need to force newline on VAR -
                     # for (var x = 0...
                     if token_text == 'if' and self.last_word == 'else' and self.last_text != '{':
@@ -947,15 +1805,15 @@ class Beautifier:
         self.flags.var_line_reindented = False
         if self.flags.mode == 'OBJECT':
             # OBJECT mode is weird and doesn't get reset too well.
-            self.flags.mode = 'BLOCK'
+            self.flags.mode = MODE_BLOCK
 
 
     def handle_string(self, token_text):
-        if self.last_type == 'TK_END_EXPR' and self.flags.previous_mode in ['(COND-EXPRESSION)', '(FOR-EXPRESSION)']:
+        if self.last_type == TK_END_EXPR and self.flags.previous_mode in [MODE_COND_EXPRESSION, MODE_FOR_EXPRESSION]:
             self.append(' ')
-        if self.last_type in ['TK_COMMENT', 'TK_STRING', 'TK_START_BLOCK', 'TK_END_BLOCK', 'TK_SEMICOLON']:
+        if self.last_type in [TK_COMMENT, TK_STRING, TK_START_BLOCK, TK_END_BLOCK, TK_SEMICOLON]:
             self.append_newline()
-        elif self.last_type == 'TK_WORD':
+        elif self.last_type == TK_WORD:
             self.append(' ')
 
         self.append(token_text)
@@ -974,11 +1832,11 @@ class Beautifier:
     def handle_comma(self, token_text):
 
 
-        if self.last_type == 'TK_COMMENT':
+        if self.last_type == TK_COMMENT:
             self.append_newline();
 
         if self.flags.var_line:
-            if self.is_expression(self.flags.mode) or self.last_type == 'TK_END_BLOCK':
+            if self.is_expression(self.flags.mode) or self.last_type == TK_END_BLOCK:
                 # do not break on comma, for ( var a = 1, b = 2
                 self.flags.var_line_tainted = False
             if self.flags.var_line_tainted:
@@ -994,7 +1852,7 @@ class Beautifier:
             self.append(' ');
             return
 
-        if self.last_type == 'TK_END_BLOCK' and self.flags.mode != '(EXPRESSION)':
+        if self.last_type == TK_END_BLOCK and self.flags.mode != MODE_EXPRESSION:
             self.append(token_text)
             if self.flags.mode == 'OBJECT' and self.last_text == '}':
                 self.append_newline()
@@ -1021,7 +1879,7 @@ class Beautifier:
             return
 
         # hack for actionscript's import .*;
-        if token_text == '*' and self.last_type == 'TK_UNKNOWN' and not self.last_last_text.isdigit():
+        if token_text == '*' and self.last_type == TK_UNKNOWN and not self.last_last_text.isdigit():
             self.append(token_text)
             return
 
@@ -1040,7 +1898,7 @@ class Beautifier:
 
         if token_text in ['--', '++', '!'] \
                 or (token_text in ['+', '-'] \
-                    and (self.last_type in ['TK_START_BLOCK', 'TK_START_EXPR', 'TK_EQUALS', 'TK_OPERATOR'] \
+                    and (self.last_type in [TK_START_BLOCK, TK_START_EXPR, TK_EQUALS, TK_OPERATOR] \
                     or self.last_text in self.line_starters)):
 
             space_before = False
@@ -1051,10 +1909,10 @@ class Beautifier:
                 #         ^^
                 space_before = True
 
-            if self.last_type == 'TK_WORD' and self.last_text in self.line_starters:
+            if self.last_type == TK_WORD and self.last_text in self.line_starters:
                 space_before = True
 
-            if self.flags.mode == 'BLOCK' and self.last_text in ['{', ';']:
+            if self.flags.mode == MODE_BLOCK and self.last_text in ['{', ';']:
                 # { foo: --i }
                 # foo(): --bar
                 self.append_newline()
@@ -1065,7 +1923,7 @@ class Beautifier:
 
         elif token_text == ':':
             if self.flags.ternary_depth == 0:
-                if self.flags.mode == 'BLOCK':
+                if self.flags.mode == MODE_BLOCK:
                     self.flags.mode = 'OBJECT'
                 space_before = False
             else:
@@ -1120,7 +1978,7 @@ class Beautifier:
         if self.last_text == ',' and not self.wanted_newline:
             self.trim_output(True)
 
-        if self.last_type != 'TK_COMMENT':
+        if self.last_type != TK_COMMENT:
             if self.wanted_newline:
                 self.append_newline()
             else:
@@ -1140,14 +1998,20 @@ class Beautifier:
 
 
 def main():
+    # only the command line needs these
+    import getopt
+    import glob
 
     argv = sys.argv[1:]
 
     try:
-        opts, args = getopt.getopt(argv, "s:c:o:djbkil:xhtf", ['indent-size=','indent-char=','outfile=', 'disable-preserve-newlines',
+        opts, args = getopt.getopt(argv, "s:c:o:djbkil:xhtfrJ:", ['indent-size=','indent-char=','outfile=', 'disable-preserve-newlines',
                                                           'jslint-happy', 'brace-style=',
                                                           'keep-array-indentation', 'indent-level=', 'unescape-strings', 'help',
-                                                          'usage', 'stdin', 'eval-code', 'indent-with-tabs', 'keep-function-indentation'])
+                                                          'usage', 'stdin', 'eval-code', 'indent-with-tabs', 'keep-function-indentation',
+                                                          'tokenizer=', 'mmap', 'replace', 'output-dir=', 'jobs=',
+                                                          'cache-dir=', 'cache-size=', 'profile', 'json',
+                                                          'disable-unpacking', 'unpack-depth='])
     except getopt.GetoptError:
         return usage()
 
@@ -1155,6 +2019,10 @@ def main():
 
     file = None
     outfile = 'stdout'
+    use_mmap = False
+    replace = False
+    output_dir = None
+    jobs = None
     if len(args) == 1:
         file = args[0]
 
@@ -1181,16 +2049,60 @@ def main():
             js_options.brace_style = arg
         elif opt in ('--unescape-strings', '-x'):
             js_options.unescape_strings = True
+        elif opt == '--tokenizer':
+            js_options.tokenizer = arg
+        elif opt == '--cache-dir':
+            js_options.cache_dir = arg
+        elif opt == '--cache-size':
+            js_options.cache_size = int(arg)
+        elif opt == '--profile':
+            js_options.profile = print_profile
+        elif opt == '--json':
+            js_options.json = True
+        elif opt == '--disable-unpacking':
+            js_options.unpack = False
+        elif opt == '--unpack-depth':
+            js_options.unpack_depth = int(arg)
+        elif opt == '--mmap':
+            use_mmap = True
+        elif opt in ('--replace', '-r'):
+            replace = True
+        elif opt == '--output-dir':
+            output_dir = arg
+        elif opt in ('--jobs', '-J'):
+            jobs = int(arg)
         elif opt in ('--stdin', '-i'):
             file = '-'
         elif opt in ('--help', '--usage', '-h'):
             return usage()
 
+    if replace or output_dir or len(args) > 1 \
+       or [path for path in args if os.path.isdir(path) or glob.has_magic(path)]:
+        if not args:
+            return usage()
+        if not (replace or output_dir):
+            sys.stderr.write('error: several files, a directory or a glob need '
+                             '--replace or --output-dir=DIR\n')
+            sys.exit(1)
+        import jsbeautifier.batch
+        results = jsbeautifier.batch.run(args, js_options, output_dir, jobs, use_mmap, sys.stdout)
+        if [result for result in results if result[3]]:
+            sys.exit(1)
+        return
+
     if not file:
         return usage()
     else:
-        if outfile == 'stdout':
-            print(beautify_file(file, js_options))
-        else:
-            with open(outfile, 'w') as f:
-                f.write(beautify_file(file, js_options) + '\n')
+        try:
+            if outfile == 'stdout':
+                for chunk in beautify_file_iter(file, js_options, use_mmap):
+                    sys.stdout.write(chunk)
+                sys.stdout.write('\n')
+            else:
+                with open(outfile, 'w') as f:
+                    for chunk in beautify_file_iter(file, js_options, use_mmap):
+                        f.write(chunk)
+                    f.write('\n')
+        except InputError as error:
+            sys.stderr.write('error: %s\n' % error)
+            sys.exit(1)
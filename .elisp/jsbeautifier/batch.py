@@ -0,0 +1,148 @@
+#
+# Batch mode for the javascript beautifier: formats many files at once,
+# spread over a pool of worker processes.
+#
+# usage:
+#
+#   import jsbeautifier.batch
+#   jsbeautifier.batch.run(['src', 'lib/*.js'], opts, output_dir='pretty')
+#
+
+"""Beautifies many files, globs or directories across worker processes."""
+
+import glob
+import os
+import time
+
+# concurrent.futures is missing from Python 2 without the backport:
+# files are then beautified one after the other
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:
+    ProcessPoolExecutor = None
+
+import jsbeautifier
+
+EXTENSIONS = ['.js', '.json']
+
+# os.rename does not replace existing files on Windows
+_replace = getattr(os, 'replace', os.rename)
+
+
+def collect(paths):
+    """Expands files, globs and directories (recursively, .js and .json files
+    only) to a list of (file, root) pairs. The file path relative to its
+    root is the one mirrored in the output directory."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if os.path.splitext(filename)[1] in EXTENSIONS:
+                        found.append((os.path.join(dirpath, filename), path))
+        elif glob.has_magic(path):
+            root = _globroot(path)
+            for match in sorted(glob.glob(path)):
+                if os.path.isfile(match):
+                    found.append((match, root))
+        else:
+            found.append((path, os.path.dirname(path)))
+
+    seen = set()
+    unique = []
+    for filename, root in found:
+        if filename not in seen:
+            seen.add(filename)
+            unique.append((filename, root))
+    return unique
+
+
+def _globroot(pattern):
+    """Leading directories of `pattern` which contain no wildcards."""
+    parts = []
+    for part in os.path.dirname(pattern).split(os.sep):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return os.sep.join(parts)
+
+
+def target(filename, root, output_dir=None):
+    """Where the result for `filename` goes: the file itself or its mirror."""
+    if output_dir is None:
+        return filename
+    return os.path.join(output_dir, os.path.relpath(filename, root or os.curdir))
+
+
+def beautify_job(job):
+    """Beautifies one file into its target. Runs in a worker process and
+    returns (filename, size in bytes, seconds, error or None). Any error
+    fails this file only, leaving its target as it was."""
+    filename, destination, opts, use_mmap = job
+    start = time.time()
+    try:
+        size = os.path.getsize(filename)
+        directory = os.path.dirname(destination)
+        if directory and not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # another worker got there first
+                if not os.path.isdir(directory):
+                    raise
+        temporary = '%s.%d.tmp' % (destination, os.getpid())
+        try:
+            with open(temporary, 'w') as f:
+                for chunk in jsbeautifier._beautify_file_iter(filename, opts, use_mmap, True):
+                    f.write(chunk)
+                f.write('\n')
+            _replace(temporary, destination)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+    except Exception as error:
+        return filename, 0, time.time() - start, str(error) or type(error).__name__
+    return filename, size, time.time() - start, None
+
+
+def run(paths, opts=None, output_dir=None, jobs=None, use_mmap=False,
+        report=None):
+    """Beautifies every file found in `paths` in place, or into `output_dir`
+    when given, using `jobs` processes (default: one per core). Per-file
+    timings and a summary are written to `report`, if not None. Returns
+    the list of results from beautify_job()."""
+    opts = opts or jsbeautifier.default_options()
+    work = [(filename, target(filename, root, output_dir), opts, use_mmap)
+            for filename, root in collect(paths)]
+
+    start = time.time()
+    if ProcessPoolExecutor is None or jobs == 1 or len(work) < 2:
+        results = [beautify_job(job) for job in work]
+        if report is not None:
+            for result in results:
+                _report(report, result)
+    else:
+        results = []
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for result in executor.map(beautify_job, work, chunksize=4):
+                results.append(result)
+                if report is not None:
+                    _report(report, result)
+    elapsed = time.time() - start
+
+    if report is not None:
+        size = sum(result[1] for result in results)
+        failed = len([result for result in results if result[3]])
+        report.write('%d files, %d failed, %.2f MB in %.2f s (%.2f MB/s)\n' % (
+            len(results), failed, size / 1048576., elapsed,
+            size / 1048576. / elapsed if elapsed else 0))
+    return results
+
+
+def _report(report, result):
+    filename, size, seconds, error = result
+    if error:
+        report.write('%s: error: %s\n' % (filename, error))
+    else:
+        report.write('%s: %d bytes in %.3f s\n' % (filename, size, seconds))
@@ -0,0 +1,171 @@
+#
+# Benchmarks for the javascript beautifier. Each one is a module that can
+# be run on its own:
+#
+#   python -m jsbeautifier.benchmarks.benchtokens [size in KB]
+#
+# and jsbeautifier.benchmarks.suite runs beautify() over the whole corpus
+# generated here, saving the results as JSON:
+#
+#   python -m jsbeautifier.benchmarks.suite -o results.json
+#
+
+"""Helpers shared by the beautifier benchmarks."""
+
+import copy
+import os
+import re
+import time
+
+import jsbeautifier
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      'unpackers', 'tests', 'test-myobfuscate-output.js')
+
+
+def pretty(size):
+    """At least `size` characters of indented and commented javascript:
+    copies of the sample file as it is."""
+    with open(SAMPLE) as f:
+        code = f.read()
+    return '\n'.join([code] * (size // len(code) + 1))
+
+
+def minified(size):
+    """At least `size` characters of javascript without comments,
+    indentation or blank lines, made of copies of the sample file."""
+    with open(SAMPLE) as f:
+        lines = [line.strip() for line in f]
+    code = '\n'.join(line for line in lines
+                     if line and not line.startswith('//'))
+    return '\n'.join([code] * (size // len(code) + 1))
+
+
+def nested(size, depth = 20):
+    """At least `size` characters of minified javascript nesting arrays,
+    objects and calls `depth` levels deep."""
+    def level(n):
+        if n == 0:
+            return 'x'
+        inner = level(n - 1)
+        return ('[%s,1]', '{a:%s,b:2}', 'f(%s,3)')[n % 3] % inner
+    code = 'v=%s;' % level(depth)
+    return '\n'.join([code] * (size // len(code) + 1))
+
+
+def nested_arrays(size, depth = 12):
+    """At least `size` characters of arrays nested `depth` levels deep,
+    one element per line with irregular indentation, the kind of input
+    keep_array_indentation is meant for."""
+    def level(n, indent):
+        if n == 0:
+            return '1'
+        inner = ' ' * (indent + 2 + n % 3)
+        items = [level(n - 1, len(inner)), '"%d"' % n, level(n // 2, len(inner))]
+        return '[\n%s%s\n%s]' % (inner, (',\n' + inner).join(items), ' ' * indent)
+    code = 'var a = %s;' % level(depth, 0)
+    return '\n'.join([code] * (size // len(code) + 1))
+
+
+def long_strings(size, length = 4096):
+    """At least `size` characters of string literals `length` characters
+    long, full of \\x and \\u escapes for unescape_strings to decode."""
+    pieces = ['\\x41\\x62\\x20', 'plain text ', '\\u0063\\u0044', '\\x3c\\x22\\x5c',
+              '\\n\\t', "it\\'s "]
+    body = ''.join(pieces[i % len(pieces)] for i in range(length // 8))
+    code = "s.push('%s');" % body
+    return '\n'.join([code] * (size // len(code) + 1))
+
+
+def block_comments(size, length = 65536):
+    """At least `size` characters of block comments `length` characters
+    long, with a statement between each of them."""
+    line = ' * Lorem ipsum dolor sit amet, consectetur adipiscing elit.\n'
+    code = '/**\n%s */\nf();' % (line * (length // len(line)))
+    return '\n'.join([code] * (size // len(code) + 1))
+
+
+def packed(size):
+    """At least `size` characters of minified javascript, packed with
+    Dean Edwards' p.a.c.k.e.r (base 62)."""
+    return pack(minified(size))
+
+
+def packed_symbols(count):
+    """Javascript with a table of string literals, packed with a symtab of
+    `count` words or so (as ad network scripts are): each line reads one
+    string from the table by index into a variable of its own."""
+    n = max((count - 2) // 3, 1)
+    code = 'var _0x1f=["%s"];' % '","'.join('s%d' % i for i in range(n))
+    code += ''.join('v%d=_0x1f[%d]+v%d;' % (i, i, i * 7 % n) for i in range(n))
+    return pack(code)
+
+
+def pack(code):
+    """`code` packed with p.a.c.k.e.r (base 62). Nothing in the payload is
+    escaped: that is enough for the unpacker, not for a browser."""
+    symbols = sorted(set(re.findall(r'\b\w+\b', code)))
+    alphabet = '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    def encode(n):
+        return (encode(n // 62) if n >= 62 else '') + alphabet[n % 62]
+    index = dict((symbol, encode(n)) for n, symbol in enumerate(symbols))
+    payload = re.sub(r'\b\w+\b', lambda match: index[match.group(0)], code)
+    return ("eval(function(p,a,c,k,e,r){e=function(c){return(c<a?'':e(parseInt(c/a)))+"
+            "((c=c%%a)>35?String.fromCharCode(c+29):c.toString(36))};if(!''.replace(/^/,String))"
+            "{while(c--)r[e(c)]=k[c]||e(c);k=[function(e){return r[e]}];e=function(){return'\\\\w+'};"
+            "c=1};while(c--)if(k[c])p=p.replace(new RegExp('\\\\b'+e(c)+'\\\\b','g'),k[c]);"
+            "return p}('%s',62,%d,'%s'.split('|'),0,{}))" % (payload, len(symbols), '|'.join(symbols)))
+
+
+def json_document(size):
+    """At least `size` characters of JSON, like an API dump: an array of
+    records with strings, numbers, literals and nested objects and arrays,
+    laid out by json.dumps with an indent of 2."""
+    import json
+    records = []
+    length = 2
+    n = 0
+    while length < size:
+        record = {
+            'id': n,
+            'name': 'item %d' % n,
+            'price': n * 1.25 - 100,
+            'ratio': 1.5e-7 * n,
+            'active': n % 3 == 0,
+            'parent': None if n % 5 else n // 5,
+            'tags': ['tag%d' % (n % 7), 'tag%d' % (n % 11)],
+            'position': {'x': n % 13, 'y': -(n % 17), 'path': [[n, n + 1], [n + 2]]},
+        }
+        length += len(json.dumps(record, indent=2, sort_keys=True)) + 4
+        records.append(record)
+        n += 1
+    return json.dumps(records, indent=2, sort_keys=True)
+
+
+def tokens(source, opts = None):
+    """(text, type) of every token the beautifier handles in `source`,
+    on the general path: the JSON fast path handles no tokens this way."""
+    if opts is not None and opts.json:
+        opts = copy.copy(opts)
+        opts.json = False
+    b = jsbeautifier.Beautifier(opts)
+    seen = []
+    def recorder(token_type, handler):
+        def record(token_text):
+            seen.append((token_text, token_type))
+            handler(token_text)
+        return record
+    b.handlers = [recorder(token_type, handler)
+                  for token_type, handler in enumerate(b.handlers)]
+    b.beautify(source)
+    return seen
+
+
+def best_of(function, repeat=3):
+    """Shortest of `repeat` timings of function(), in seconds."""
+    timings = []
+    for i in range(repeat):
+        start = time.time()
+        function()
+        timings.append(time.time() - start)
+    return min(timings)
@@ -0,0 +1,34 @@
+#
+# Scanning of huge comments: a licence-style block comment, a block
+# comment on a single line and a source-map style line comment, for both
+# tokenizers.
+#
+#   python -m jsbeautifier.benchmarks.benchcomments [size in KB]
+#
+
+import sys
+
+import jsbeautifier
+from jsbeautifier.benchmarks import block_comments, best_of
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    inline = '/* %s */ f();' % ('x' * (size * 1024))
+    source_map = 'f();\n//# sourceMappingURL=data:application/json;base64,%s\ng();' % (
+        'eyJ2ZXJzaW9uIjozfQ' * (size * 1024 // 18))
+
+    for name, source in [
+            ('block comment', block_comments(size * 1024, size * 1024)),
+            ('inline block comment', inline),
+            ('line comment', source_map)]:
+        for tokenizer in ['regex', 'classic']:
+            opts = jsbeautifier.default_options()
+            opts.tokenizer = tokenizer
+            seconds = best_of(lambda: jsbeautifier.beautify(source, opts))
+            print('%-22s %-8s %7.3f s %8.2f MB/s' % (
+                name, tokenizer, seconds, len(source) / 1048576. / seconds))
+
+
+if __name__ == '__main__':
+    main()
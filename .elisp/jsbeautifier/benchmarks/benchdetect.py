@@ -0,0 +1,52 @@
+#
+# Cost of deciding whether input needs unpacking, on large sources which
+# do not: every detect() over the whole source, as the unpackers used to
+# be asked, against unpackers.detect() with its pre-scan of the first
+# PRESCAN_SIZE characters. Peak memory is shown where tracemalloc exists.
+#
+#   python -m jsbeautifier.benchmarks.benchdetect [size in KB]
+#
+
+import sys
+
+# tracemalloc is new in Python 3.4
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from jsbeautifier import unpackers
+from jsbeautifier.benchmarks import minified, nested, pretty, best_of
+
+
+def full_detect(source):
+    return any(mod.detect(source) for mod in unpackers.getunpackers())
+
+
+def peak(function):
+    if tracemalloc is None:
+        return float('nan')
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1] / 1048576.
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 8192
+    for name, source in [
+            ('pretty', pretty(size * 1024)),
+            ('minified', minified(size * 1024)),
+            # no spaces at all: the urlencode check reads all of it
+            ('nested', nested(size * 1024))]:
+        for method, detect in [('every detect()', full_detect),
+                               ('pre-scan', unpackers.detect)]:
+            seconds = best_of(lambda: detect(source))
+            print('%-9s %-15s %9.3f ms  peak %7.2f MB' % (
+                name, method, seconds * 1000, peak(lambda: detect(source))))
+
+
+if __name__ == '__main__':
+    main()
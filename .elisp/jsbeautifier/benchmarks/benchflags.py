@@ -0,0 +1,71 @@
+#
+# Allocations made for the mode stack: BeautifierFlags objects created
+# per token and the memory each of them takes, on deeply nested input.
+#
+#   python -m jsbeautifier.benchmarks.benchflags [size in KB] [depth]
+#
+
+import sys
+
+# tracemalloc is new in Python 3.4
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+import jsbeautifier
+from jsbeautifier.benchmarks import nested, tokens, best_of
+
+
+def count_flags(source):
+    """Number of BeautifierFlags created while beautifying `source`."""
+    created = [0]
+    original = jsbeautifier.BeautifierFlags
+    class CountingFlags(original):
+        __slots__ = ()
+        def __init__(self, mode):
+            created[0] += 1
+            original.__init__(self, mode)
+    jsbeautifier.BeautifierFlags = CountingFlags
+    try:
+        jsbeautifier.beautify(source)
+    finally:
+        jsbeautifier.BeautifierFlags = original
+    return created[0]
+
+
+def flags_size():
+    """Bytes taken by one BeautifierFlags, with its __dict__ if it has one."""
+    flags = jsbeautifier.BeautifierFlags(jsbeautifier.MODE_BLOCK)
+    size = sys.getsizeof(flags)
+    if hasattr(flags, '__dict__'):
+        size += sys.getsizeof(flags.__dict__)
+    return size
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    source = nested(size * 1024, depth)
+    stream = tokens(source)
+    count = float(len(stream))
+    openers = len([t for t in stream if t[1] in (jsbeautifier.TK_START_EXPR,
+                                                  jsbeautifier.TK_START_BLOCK)])
+
+    print('%d tokens, %d of them (, [ or {, nested %d deep' % (count, openers, depth))
+    flags = count_flags(source)
+    print('flags created:     %7.3f per token, %.3f per (, [ or {' % (
+        flags / count, flags / float(openers)))
+    print('flags size:        %7d bytes' % flags_size())
+    if tracemalloc is not None:
+        tracemalloc.start()
+        jsbeautifier.beautify(source)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print('peak memory:       %7.1f bytes/token' % (peak / count))
+    total = best_of(lambda: jsbeautifier.beautify(source))
+    print('beautify:          %7.1f ns/token' % (total / count * 1e9))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+#
+# Unpacking of p.a.c.k.e.r. files with large symtabs and string tables:
+# packer.unpack() against the way it used to work, decoding every word of
+# the payload with the Unbaser and replacing the string table entries one
+# str.replace() over the whole source at a time.
+#
+#   python -m jsbeautifier.benchmarks.benchpacker [symbols]
+#
+
+import re
+import sys
+
+from jsbeautifier.benchmarks import packed_symbols, best_of
+from jsbeautifier.unpackers import packer
+
+
+def word_by_word(source):
+    payload, symtab, radix, count = packer._filterargs(source)
+    unbase = packer.Unbaser(radix).unbase
+    source = re.sub(r'\b\w+\b', lambda match: symtab[unbase(match.group(0))] or match.group(0),
+                    payload)
+    match = re.search(r'var *(_\w+)\=\["(.*?)"\];', source, re.DOTALL)
+    varname, strings = match.groups()
+    for index, value in enumerate(strings.split('","')):
+        source = source.replace('%s[%d]' % (varname, index), '"%s"' % value)
+    return source[len(match.group(0)):]
+
+
+def main():
+    symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    source = packed_symbols(symbols)
+    if word_by_word(source) != packer.unpack(source):
+        raise AssertionError('unpack() and the reference differ')
+    for name, unpack in [('word by word', word_by_word),
+                         ('single pass', packer.unpack)]:
+        seconds = best_of(lambda: unpack(source))
+        print('%-13s %6d symbols %9.3f ms' % (name, symbols, seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
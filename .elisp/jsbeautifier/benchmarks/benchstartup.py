@@ -0,0 +1,45 @@
+#
+# Start-up time, the bulk of the wall time of the command line on small
+# files: a fresh interpreter importing jsbeautifier, and one beautifying
+# a short snippet (which loads the unpackers), less the time of an
+# interpreter doing nothing.
+#
+#   python -m jsbeautifier.benchmarks.benchstartup [runs]
+#
+
+import os
+import subprocess
+import sys
+
+from jsbeautifier.benchmarks import best_of
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCRIPTS = [
+    ('import', 'import jsbeautifier'),
+    ('small beautify', 'import jsbeautifier; jsbeautifier.beautify("var a = [1, 2];")'),
+]
+
+
+def interpreter(script):
+    # with bytecode written and read, as in any installed copy
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    def run():
+        subprocess.check_call([sys.executable, '-c', script], cwd = ROOT, env = env)
+    return run
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    # write the bytecode first
+    interpreter(SCRIPTS[-1][1])()
+    baseline = best_of(interpreter('pass'), runs)
+    print('%-15s %7.1f ms' % ('interpreter', baseline * 1000))
+    for name, script in SCRIPTS:
+        seconds = best_of(interpreter(script), runs)
+        print('%-15s %7.1f ms  (+%.1f ms)' % (name, seconds * 1000, (seconds - baseline) * 1000))
+
+
+if __name__ == '__main__':
+    main()
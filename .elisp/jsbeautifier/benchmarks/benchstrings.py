@@ -0,0 +1,53 @@
+#
+# Scanning of long string and regexp literals: a single literal made of
+# \xNN escapes, with and without unescape_strings, and a long regexp,
+# for both tokenizers. Peak memory is shown where tracemalloc exists: it
+# should stay a small multiple of the size of the literal.
+#
+#   python -m jsbeautifier.benchmarks.benchstrings [size in KB]
+#
+
+import sys
+
+# tracemalloc is new in Python 3.4
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+import jsbeautifier
+from jsbeautifier.benchmarks import best_of
+
+
+def peak(function):
+    if tracemalloc is None:
+        return float('nan')
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1] / 1048576.
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    escapes = 'var s = "%s";' % ('\\x41\\x62\\x5c\\x22' * (size * 1024 // 16))
+    regexp = 'var r = /%s/g;' % ('[a-z\\/]+\\d\\/' * (size * 1024 // 14))
+
+    for name, source, unescape_strings in [
+            ('\\x literal', escapes, False),
+            ('\\x literal, unescaped', escapes, True),
+            ('regexp literal', regexp, False)]:
+        for tokenizer in ['regex', 'classic']:
+            opts = jsbeautifier.default_options()
+            opts.unescape_strings = unescape_strings
+            opts.tokenizer = tokenizer
+            seconds = best_of(lambda: jsbeautifier.beautify(source, opts), 1)
+            print('%-24s %-8s %7.3f s %8.2f MB/s  peak %7.2f MB' % (
+                name, tokenizer, seconds, len(source) / 1048576. / seconds,
+                peak(lambda: jsbeautifier.beautify(source, opts))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#
+# Cost of dispatching tokens to their handlers: the former per-token dict
+# of bound methods keyed by type name against Beautifier.handlers indexed
+# by the integer token type, followed by the end to end throughput.
+#
+#   python -m jsbeautifier.benchmarks.benchtokens [size in KB]
+#
+
+import sys
+
+import jsbeautifier
+from jsbeautifier.benchmarks import minified, tokens, best_of
+
+
+class Handlers(object):
+    """Handlers doing nothing, so that only the dispatch gets timed."""
+    def ignore(self, token_text):
+        pass
+    handle_start_expr = handle_end_expr = handle_start_block = \
+        handle_end_block = handle_word = handle_semicolon = handle_string = \
+        handle_equals = handle_operator = handle_comma = \
+        handle_block_comment = handle_inline_comment = handle_comment = \
+        handle_unknown = ignore
+
+
+def dispatch_by_name(stream):
+    h = Handlers()
+    for token_text, token_name in stream:
+        handlers = {
+            'TK_START_EXPR': h.handle_start_expr,
+            'TK_END_EXPR': h.handle_end_expr,
+            'TK_START_BLOCK': h.handle_start_block,
+            'TK_END_BLOCK': h.handle_end_block,
+            'TK_WORD': h.handle_word,
+            'TK_SEMICOLON': h.handle_semicolon,
+            'TK_STRING': h.handle_string,
+            'TK_EQUALS': h.handle_equals,
+            'TK_OPERATOR': h.handle_operator,
+            'TK_COMMA': h.handle_comma,
+            'TK_BLOCK_COMMENT': h.handle_block_comment,
+            'TK_INLINE_COMMENT': h.handle_inline_comment,
+            'TK_COMMENT': h.handle_comment,
+            'TK_UNKNOWN': h.handle_unknown,
+        }
+        handlers[token_name](token_text)
+
+
+def dispatch_by_index(stream):
+    h = Handlers()
+    handlers = [
+        h.handle_start_expr,
+        h.handle_end_expr,
+        h.handle_start_block,
+        h.handle_end_block,
+        h.handle_word,
+        h.handle_semicolon,
+        h.handle_string,
+        h.handle_equals,
+        h.handle_operator,
+        h.handle_comma,
+        h.handle_block_comment,
+        h.handle_inline_comment,
+        h.handle_comment,
+        h.handle_unknown,
+    ]
+    for token_text, token_type in stream:
+        handlers[token_type](token_text)
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    source = minified(size * 1024)
+    stream = tokens(source)
+    named = [(token_text, jsbeautifier.TOKEN_NAMES[token_type])
+             for token_text, token_type in stream]
+    count = float(len(stream))
+
+    print('%d tokens in %d KB of minified input' % (count, len(source) // 1024))
+    by_name = best_of(lambda: dispatch_by_name(named))
+    by_index = best_of(lambda: dispatch_by_index(stream))
+    print('dispatch by name:  %7.1f ns/token' % (by_name / count * 1e9))
+    print('dispatch by index: %7.1f ns/token' % (by_index / count * 1e9))
+    total = best_of(lambda: jsbeautifier.beautify(source))
+    print('beautify:          %7.1f ns/token, %.2f MB/s' % (
+        total / count * 1e9, len(source) / 1048576. / total))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+#
+# Benchmark suite: times beautify() on a generated corpus, one category
+# of input at a time, and saves the results so that two commits can be
+# compared.
+#
+#   python -m jsbeautifier.benchmarks.suite -o before.json
+#   (change things)
+#   python -m jsbeautifier.benchmarks.suite -o after.json -c before.json
+#
+
+"""Times beautify() per category of input and reports tokens/s, MB/s
+and peak memory."""
+
+import getopt
+import json
+import platform
+import sys
+import time
+
+# tracemalloc is new in Python 3.4
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+import jsbeautifier
+from jsbeautifier import benchmarks
+
+# name, corpus generator taking a size in characters, options to set
+CATEGORIES = [
+    ('minified', benchmarks.minified, {}),
+    ('pretty', benchmarks.pretty, {}),
+    ('nested', benchmarks.nested, {}),
+    ('nested-arrays', benchmarks.nested_arrays, {'keep_array_indentation': True}),
+    ('long-strings', benchmarks.long_strings, {'unescape_strings': True}),
+    ('block-comments', benchmarks.block_comments, {}),
+    ('packed', benchmarks.packed, {}),
+    ('json', benchmarks.json_document, {}),
+    ('json-fast', benchmarks.json_document, {'json': True}),
+]
+
+
+def measure(source, opts, repeat = 3):
+    """Runs beautify(source, opts) and returns a dict with its timing,
+    throughput and peak memory (None without tracemalloc)."""
+    count = len(benchmarks.tokens(source, opts))
+    seconds = benchmarks.best_of(lambda: jsbeautifier.beautify(source, opts), repeat)
+    size = len(source.encode('utf8'))
+
+    peak = None
+    if tracemalloc is not None:
+        tracemalloc.start()
+        try:
+            jsbeautifier.beautify(source, opts)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'bytes': size,
+        'tokens': count,
+        'seconds': seconds,
+        'tokens_per_second': count / seconds if seconds else None,
+        'mb_per_second': size / 1048576. / seconds if seconds else None,
+        'peak_memory': peak,
+    }
+
+
+def run(size = 256 * 1024, repeat = 3, categories = None, report = None):
+    """Measures every category (or the ones named in `categories`) on
+    about `size` characters of input. Progress is written to `report`,
+    if not None. Returns the results as a dict ready for json.dump()."""
+    results = {}
+    for name, generate, settings in CATEGORIES:
+        if categories and name not in categories:
+            continue
+        opts = jsbeautifier.default_options()
+        for option, value in settings.items():
+            setattr(opts, option, value)
+        results[name] = measure(generate(size), opts, repeat)
+        if report is not None:
+            _report(report, name, results[name])
+
+    return {
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'size': size,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare(old, new, report):
+    """Writes the change in throughput of every category found in both
+    `old` and `new`, as returned by run()."""
+    for name in sorted(new['results']):
+        if name not in old['results']:
+            continue
+        before = old['results'][name]['mb_per_second']
+        after = new['results'][name]['mb_per_second']
+        if before and after:
+            report.write('%-16s %8.2f -> %8.2f MB/s  %+6.1f%%\n' % (
+                name, before, after, (after / before - 1) * 100))
+
+
+def _report(report, name, result):
+    peak = result['peak_memory']
+    report.write('%-16s %8d tokens/s %8.2f MB/s  peak %s\n' % (
+        name, result['tokens_per_second'] or 0, result['mb_per_second'] or 0,
+        '%.1f MB' % (peak / 1048576.) if peak is not None else 'n/a'))
+    report.flush()
+
+
+def usage():
+    print("""Benchmarks jsbeautifier on a generated corpus.
+
+Usage: python -m jsbeautifier.benchmarks.suite [options] [category ...]
+
+ -s,  --size=KB                    size of the input for each category (default 256)
+ -r,  --repeat=N                   runs per category, the fastest one is kept (default 3)
+ -o,  --output=FILE                save the results as JSON
+ -c,  --compare=FILE               compare with results saved earlier
+ -h,  --help                       prints this help statement.
+
+Categories: %s
+""" % ', '.join(name for name, generate, settings in CATEGORIES))
+
+
+def main():
+    argv = sys.argv[1:]
+
+    try:
+        opts, args = getopt.getopt(argv, "s:r:o:c:h", ['size=', 'repeat=',
+            'output=', 'compare=', 'help', 'usage'])
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    size = 256 * 1024
+    repeat = 3
+    output = None
+    baseline = None
+    for opt, arg in opts:
+        if opt in ('--size', '-s'):
+            size = int(arg) * 1024
+        elif opt in ('--repeat', '-r'):
+            repeat = int(arg)
+        elif opt in ('--output', '-o'):
+            output = arg
+        elif opt in ('--compare', '-c'):
+            baseline = arg
+        elif opt in ('--help', '--usage', '-h'):
+            return usage()
+
+    known = [name for name, generate, settings in CATEGORIES]
+    for name in args:
+        if name not in known:
+            usage()
+            sys.exit(2)
+
+    results = run(size, repeat, args, sys.stdout)
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent = 2, sort_keys = True)
+    if baseline:
+        with open(baseline) as f:
+            compare(json.load(f), results, sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+#
+# Content-addressed result cache for the javascript beautifier.
+#
+# usage:
+#
+#   opts = jsbeautifier.default_options()
+#   opts.cache_dir = '/var/cache/jsbeautifier'
+#   res = jsbeautifier.beautify(some_string, opts)   # formats and stores
+#   res = jsbeautifier.beautify(some_string, opts)   # read back from disk
+#   jsbeautifier.cache.get_cache(opts).hits          # -> 1
+#
+
+"""On-disk cache of beautified code, keyed by input and options."""
+
+import codecs
+import hashlib
+import os
+import tempfile
+
+READ_SIZE = 65536
+
+# os.rename does not replace existing files on Windows
+_replace = getattr(os, 'replace', os.rename)
+
+_caches = {}
+_fingerprint = []
+
+
+def get_cache(opts):
+    """Returns the ResultCache for opts.cache_dir, shared by every call in
+    this process so that its counters add up."""
+    directory = os.path.abspath(opts.cache_dir)
+    if directory not in _caches:
+        _caches[directory] = ResultCache(directory, opts.cache_size)
+    cache = _caches[directory]
+    cache.max_size = opts.cache_size
+    return cache
+
+
+def serialize_options(opts):
+    """Every option that may change the result, in a stable order."""
+    return repr(sorted((name, value) for name, value in vars(opts).items()
+                       if not name.startswith('cache_') and name != 'profile'))
+
+
+def code_fingerprint():
+    """Hash of the beautifier sources: results from other versions of the
+    code must not be served."""
+    if not _fingerprint:
+        digest = hashlib.sha256()
+        package = os.path.dirname(os.path.abspath(__file__))
+        for dirpath, dirnames, filenames in os.walk(package):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.endswith('.py'):
+                    with open(os.path.join(dirpath, filename), 'rb') as f:
+                        digest.update(f.read())
+        _fingerprint.append(digest.hexdigest())
+    return _fingerprint[0]
+
+
+class ResultCache(object):
+    """Results stored as one file per key under `directory`, evicted least
+    recently used first once they take more than `max_size` bytes. Entries
+    are written to a temporary file and renamed into place, so processes
+    sharing the directory never see partial results."""
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = None # bytes in the cache, as last seen by this process
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                if not os.path.isdir(directory):
+                    raise
+
+    def key(self, opts, source):
+        """Key for a source string."""
+        digest = self._digest(opts)
+        digest.update(b'string\0')
+        # Python 2 sources may be byte strings already
+        digest.update(source if isinstance(source, bytes) else source.encode('utf8'))
+        return digest.hexdigest()
+
+    def file_key(self, opts, file_name, use_mmap=False):
+        """Key for the contents of a file, read in pieces. Text mode reads
+        translate newlines and mmap reads do not, so the two get different keys."""
+        digest = self._digest(opts)
+        digest.update(b'mmap\0' if use_mmap else b'file\0')
+        with open(file_name, 'rb') as f:
+            while True:
+                data = f.read(READ_SIZE)
+                if not data:
+                    break
+                digest.update(data)
+        return digest.hexdigest()
+
+    def _digest(self, opts):
+        digest = hashlib.sha256()
+        digest.update(code_fingerprint().encode('ascii'))
+        digest.update(serialize_options(opts).encode('utf8'))
+        digest.update(b'\0')
+        if opts.unpack:
+            # results also depend on the unpackers registered and enabled
+            from jsbeautifier import unpackers
+            digest.update(unpackers.fingerprint().encode('utf8'))
+            digest.update(b'\0')
+        return digest
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def lookup(self, key):
+        """Returns the cached result for `key` as an open file, or None."""
+        path = self.path(key)
+        try:
+            f = open(path, 'rb')
+        except EnvironmentError:
+            self.misses += 1
+            return None
+        try:
+            # mark as recently used
+            os.utime(path, None)
+        except OSError:
+            pass
+        self.hits += 1
+        return f
+
+    def read_iter(self, f, text=True):
+        """Yields the contents of a file returned by lookup(), decoded
+        unless `text` is false: results are stored as UTF-8, and given back
+        as the type the beautifier would have given."""
+        decoder = codecs.getincrementaldecoder('utf8')()
+        try:
+            while True:
+                data = f.read(READ_SIZE)
+                if not data:
+                    break
+                yield decoder.decode(data) if text else data
+        finally:
+            f.close()
+
+    def store_iter(self, key, chunks):
+        """Passes `chunks` through while writing them to the cache; the
+        entry only appears once all of them have been consumed."""
+        directory = os.path.dirname(self.path(key))
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                if not os.path.isdir(directory):
+                    raise
+        handle, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk if isinstance(chunk, bytes) else chunk.encode('utf8'))
+                    yield chunk
+            size = os.path.getsize(temporary)
+            _replace(temporary, self.path(key))
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        self._added(size)
+
+    def _added(self, size):
+        if self.size is None:
+            self.size = self._entries_size()
+        else:
+            self.size += size
+        if self.size > self.max_size:
+            self.evict()
+
+    def _entries(self):
+        entries = []
+        for dirpath, dirnames, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if filename.endswith('.tmp'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    # evicted by another process
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _entries_size(self):
+        return sum(size for mtime, size, path in self._entries())
+
+    def evict(self):
+        """Removes the least recently used entries until the cache fits in
+        max_size again."""
+        entries = sorted(self._entries())
+        self.size = sum(size for mtime, size, path in entries)
+        for mtime, size, path in entries:
+            if self.size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except OSError:
+                pass
+            self.size -= size
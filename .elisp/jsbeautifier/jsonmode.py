@@ -0,0 +1,300 @@
+#
+# JSON mode for the javascript beautifier: JSON documents are formatted by
+# a tokenizer and emitter of their own, which skip the statement machinery
+# (var lines, case labels, special words) and the unpackers.
+#
+# usage:
+#
+#   opts = jsbeautifier.default_options()
+#   opts.json = True
+#   res = jsbeautifier.beautify('{"a":[1,2]}', opts)
+#
+# or:
+#
+#   res = jsbeautifier.beautify_json('{"a":[1,2]}')
+#
+# The output is the same as the general path would give. Anything that is
+# not a single JSON value, and keep_array_indentation (which copies the
+# input layout), goes through the general path instead.
+#
+
+"""Fast path of the beautifier for JSON documents."""
+
+import math
+import re
+
+import jsbeautifier
+from jsbeautifier import MODE_BLOCK, MODE_ARRAY, MODE_INDENTED_ARRAY, \
+    TK_START_EXPR, TK_END_EXPR, TK_START_BLOCK, TK_END_BLOCK, TK_WORD, \
+    TK_STRING, TK_OPERATOR, TK_COMMA
+
+MODE_OBJECT = 'OBJECT'
+
+# one JSON token and the whitespace before it. Groups: whitespace,
+# punctuation, string, minus sign, number or literal, fraction, exponent.
+# A number or literal running into word characters is not a JSON token,
+# and neither is anything else: match() then gives None.
+re_token = re.compile(r'([\n\r\t ]*)(?:'
+                      r'([{}\[\],:])'
+                      r'|("(?:[^"\\\x00-\x1f]+|\\["\\/bfnrt]|\\u[0-9a-fA-F]{4})*")'
+                      r'|(-?)((?:0|[1-9][0-9]*)(\.[0-9]+)?([eE][+-]?[0-9]+)?|true|false|null)(?![a-zA-Z0-9_$])'
+                      r'|$)')
+
+# what may come next
+VALUE = 0           # after ':', ',' in an array, and at the start
+VALUE_OR_CLOSE = 1  # after '['
+KEY_OR_CLOSE = 2    # after '{'
+KEY = 3             # after ',' in an object
+COLON = 4           # after a key
+NEXT = 5            # after a value: ',', a closing bracket, or the end
+
+
+class NotJSON(Exception):
+    pass
+
+
+def beautify(beautifier, source):
+    """Formats `source` for `beautifier` (its options, indentation and
+    preindent, as set up by Beautifier.beautify_iter) the way the general
+    path would. Returns None if `source` is not JSON."""
+    if beautifier.opts.keep_array_indentation:
+        return None
+    try:
+        return Emitter(beautifier).run(source)
+    except NotJSON:
+        return None
+
+
+class Emitter:
+    # the handle_* methods of Beautifier cut down to the branches JSON
+    # tokens can reach, keeping just the state those branches look at
+
+    def __init__(self, beautifier):
+        opts = beautifier.opts
+        self.beautifier = beautifier
+        self.expand = opts.brace_style == 'expand'
+        self.preserve_newlines = opts.preserve_newlines
+        # the most newlines the tokenizer counts in a row, None for any
+        self.max_newlines = None
+        if opts.max_preserve_newlines > 0:
+            self.max_newlines = int(math.ceil(opts.max_preserve_newlines))
+        elif opts.max_preserve_newlines < 0:
+            self.max_newlines = 0
+        self.unescape_strings = opts.unescape_strings
+        self.indent_string = beautifier.indent_string
+        self.preindent_string = beautifier.preindent_string
+        self.preindent = bool(beautifier.preindent_string)
+        self.output = jsbeautifier.OutputBuffer(self.indent_string, self.preindent_string)
+        self.level = 0
+        self.just_added_newline = False
+
+    def newline(self, ignore_repeated = True):
+        # Beautifier.append_newline
+        output = self.output
+        output.trim()
+        if not output:
+            return
+        if output[-1] != '\n' or not ignore_repeated:
+            self.just_added_newline = True
+            output.append('\n')
+        output.append_indentation(self.preindent, self.level)
+
+    def space(self):
+        # Beautifier.append(' ')
+        if self.output.last() not in [None, ' ', '\n', self.indent_string]:
+            self.output.append(' ')
+
+    def run(self, source):
+        output = self.output
+        append = output.append
+        space = self.space
+        newline = self.newline
+        match = re_token.match
+        expand = self.expand
+        max_newlines = self.max_newlines
+        preserve_newlines = self.preserve_newlines
+
+        stack = []
+        mode = MODE_BLOCK
+        expect = VALUE
+        last_type = TK_START_EXPR
+        last_text = ''
+        last_last_text = ''
+
+        pos = 0
+        while True:
+            m = match(source, pos)
+            if m is None:
+                raise NotJSON()
+            pos = m.end()
+            whitespace, punct, string, minus, word = m.group(1, 2, 3, 4, 5)
+
+            if punct is None and string is None and word is None:
+                # end of input
+                if stack or expect != NEXT:
+                    raise NotJSON()
+                break
+
+            wanted_newline = False
+            if whitespace:
+                n_newlines = whitespace.count('\n')
+                if max_newlines is not None and n_newlines > max_newlines:
+                    n_newlines = max_newlines
+                if preserve_newlines and n_newlines > 1:
+                    for i in range(n_newlines):
+                        newline(i == 0)
+                        self.just_added_newline = True
+                wanted_newline = n_newlines > 0
+
+            if punct is not None:
+                token_text = punct
+                if punct == '{':
+                    if expect > VALUE_OR_CLOSE:
+                        raise NotJSON()
+                    stack.append((mode, self.level))
+                    mode = MODE_BLOCK
+                    expect = KEY_OR_CLOSE
+                    if expand:
+                        if last_type != TK_OPERATOR:
+                            newline()
+                    elif last_type != TK_OPERATOR and last_type != TK_START_EXPR:
+                        space()
+                    self.level += 1
+                    append('{')
+                    self.just_added_newline = False
+                    token_type = TK_START_BLOCK
+
+                elif punct == '}':
+                    if expect != NEXT and expect != KEY_OR_CLOSE or mode is not MODE_BLOCK and mode != MODE_OBJECT \
+                            or not stack:
+                        raise NotJSON()
+                    mode, self.level = stack.pop()
+                    expect = NEXT
+                    if expand:
+                        if last_text != '{':
+                            newline()
+                    elif last_type == TK_START_BLOCK:
+                        if self.just_added_newline:
+                            if output.last() in [self.indent_string, self.preindent_string]:
+                                output.remove_last()
+                        else:
+                            output.trim()
+                    else:
+                        newline()
+                    append('}')
+                    self.just_added_newline = False
+                    token_type = TK_END_BLOCK
+
+                elif punct == '[':
+                    if expect > VALUE_OR_CLOSE:
+                        raise NotJSON()
+                    expect = VALUE_OR_CLOSE
+                    if (mode is MODE_ARRAY or mode is MODE_INDENTED_ARRAY) \
+                            and (last_text == '[' or last_text == ',' and last_last_text == ']'):
+                        # ], [ and [[ go to a new line
+                        if mode is MODE_ARRAY:
+                            mode = MODE_INDENTED_ARRAY
+                            self.level += 1
+                        stack.append((mode, self.level))
+                        mode = MODE_ARRAY
+                        newline()
+                    else:
+                        stack.append((mode, self.level))
+                        mode = MODE_ARRAY
+                    if last_type == TK_START_EXPR:
+                        if wanted_newline:
+                            newline()
+                    elif last_type == TK_COMMA:
+                        space()
+                    append('[')
+                    self.just_added_newline = False
+                    token_type = TK_START_EXPR
+
+                elif punct == ']':
+                    if expect != NEXT and expect != VALUE_OR_CLOSE or mode is not MODE_ARRAY and mode is not MODE_INDENTED_ARRAY:
+                        raise NotJSON()
+                    expect = NEXT
+                    closed = mode
+                    mode, self.level = stack.pop()
+                    if closed is MODE_INDENTED_ARRAY and last_text == ']':
+                        newline()
+                    append(']')
+                    self.just_added_newline = False
+                    token_type = TK_END_EXPR
+
+                elif punct == ',':
+                    if expect != NEXT or not stack:
+                        raise NotJSON()
+                    append(',')
+                    self.just_added_newline = False
+                    if mode == MODE_OBJECT:
+                        expect = KEY
+                        newline()
+                    else:
+                        expect = VALUE
+                        space()
+                    token_type = TK_COMMA
+
+                else: # ':'
+                    if expect != COLON:
+                        raise NotJSON()
+                    expect = VALUE
+                    if mode is MODE_BLOCK:
+                        mode = MODE_OBJECT
+                    append(':')
+                    self.just_added_newline = False
+                    space()
+                    token_type = TK_OPERATOR
+
+            elif string is not None:
+                if expect == COLON or expect == NEXT:
+                    raise NotJSON()
+                if expect >= KEY_OR_CLOSE:
+                    expect = COLON
+                else:
+                    expect = NEXT
+                token_text = string
+                if self.unescape_strings:
+                    token_text = self.beautifier.unescape_string(string[:-1], '"') + '"'
+                if last_type == TK_START_BLOCK or last_type == TK_END_BLOCK or last_type == TK_STRING:
+                    newline()
+                elif last_type == TK_WORD:
+                    space()
+                append(token_text)
+                self.just_added_newline = False
+                token_type = TK_STRING
+
+            else:
+                if expect > VALUE_OR_CLOSE:
+                    raise NotJSON()
+                expect = NEXT
+                if minus:
+                    # the general tokenizer makes this an operator of its own
+                    if last_type != TK_START_EXPR and last_type != TK_OPERATOR:
+                        space()
+                        append('-')
+                        space()
+                    else:
+                        append('-')
+                    last_last_text = last_text
+                    last_type = TK_OPERATOR
+                    last_text = '-'
+                elif wanted_newline and last_type != TK_OPERATOR:
+                    fraction, exponent = m.group(6, 7)
+                    # except for 1e+5: the tokenizer reads the exponent sign
+                    # by calling itself, which forgets the newline
+                    if fraction or not exponent or exponent[1] not in '+-':
+                        newline()
+                if (mode is MODE_ARRAY or mode is MODE_INDENTED_ARRAY) \
+                        and last_text == ',' and last_last_text == '}':
+                    newline() # }, in lists get a newline
+                append(word)
+                self.just_added_newline = False
+                token_text = word
+                token_type = TK_WORD
+
+            last_last_text = last_text
+            last_type = token_type
+            last_text = token_text
+
+        return output.finish()
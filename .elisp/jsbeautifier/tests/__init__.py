@@ -1 +1,3 @@
-# Empty file :)
+# the tests never write the entry point cache of the user
+from jsbeautifier import unpackers
+unpackers.ENTRY_POINT_CACHE = None
@@ -0,0 +1,103 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+import jsbeautifier
+import jsbeautifier.batch
+
+SOURCES = {
+    'a.js': 'var a=1;if(a){b()}',
+    os.path.join('lib', 'b.js'): 'function f(){return [1,2,3]}',
+    os.path.join('lib', 'deep', 'c.json'): '{"a":[1,2],"b":{"c":null}}',
+    os.path.join('lib', 'notes.txt'): 'not javascript',
+}
+
+
+class TestBatch(unittest.TestCase):
+    def test_output_dir(self):
+        output = os.path.join(self.directory, 'out')
+        results = jsbeautifier.batch.run([self.source], output_dir=output, jobs=2)
+
+        self.assertEqual(len(results), 3)
+        for name, code in SOURCES.items():
+            path = os.path.join(output, name)
+            if name.endswith('.txt'):
+                self.assertFalse(os.path.exists(path))
+                continue
+            with open(path) as f:
+                self.assertEqual(f.read(), jsbeautifier.beautify(code) + '\n')
+
+    def test_replace(self):
+        pattern = os.path.join(self.source, 'lib', '*.js')
+        results = jsbeautifier.batch.run([pattern, os.path.join(self.source, 'a.js')], jobs=1)
+
+        self.assertEqual([result[3] for result in results], [None, None])
+        with open(os.path.join(self.source, 'lib', 'b.js')) as f:
+            self.assertEqual(f.read(), 'function f() {\n    return [1, 2, 3]\n}\n')
+        with open(os.path.join(self.source, 'lib', 'deep', 'c.json')) as f:
+            self.assertEqual(f.read(), SOURCES[os.path.join('lib', 'deep', 'c.json')])
+
+    def test_missing_file(self):
+        results = jsbeautifier.batch.run([os.path.join(self.source, 'missing.js')])
+        self.assertTrue(results[0][3])
+
+    def test_failures(self):
+        # files which cannot be read or decoded fail on their own, leaving
+        # their targets alone, and the others are still beautified
+        bad = os.path.join(self.source, 'bad.js')
+        with open(bad, 'wb') as f:
+            f.write(b'var a = "\xc3\x28";')
+        for use_mmap in [False, True]:
+            output = os.path.join(self.directory, 'out%d' % use_mmap)
+            results = jsbeautifier.batch.run([bad, os.path.join(self.source, 'a.js')],
+                                             output_dir=output, jobs=2, use_mmap=use_mmap)
+            errors = dict((result[0], result[3]) for result in results)
+            self.assertEqual(errors[os.path.join(self.source, 'a.js')], None)
+            # Python 2 reads files as bytes: only the mmap path decodes them
+            if use_mmap or str is not bytes:
+                self.assertTrue(errors[bad])
+                self.assertFalse(os.path.exists(os.path.join(output, 'bad.js')))
+
+        results = jsbeautifier.batch.run([bad], jobs=1, use_mmap=True)
+        self.assertTrue(results[0][3])
+        with open(bad, 'rb') as f:
+            self.assertEqual(f.read(), b'var a = "\xc3\x28";')
+
+    def test_command_line(self):
+        # several files need somewhere to go: the command fails instead of
+        # printing the usage and reporting success
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        names = [os.path.join(self.source, 'a.js'), os.path.join(self.source, 'lib', 'b.js')]
+        command = [sys.executable, '-c', 'import jsbeautifier; jsbeautifier.main()']
+        env = dict(os.environ, JSBEAUTIFIER_ENTRY_POINT_CACHE='')
+        process = subprocess.Popen(command + names, cwd=root, env=env,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        output, errors = process.communicate()
+        self.assertEqual(process.returncode, 1)
+        self.assertEqual(output, b'')
+        self.assertTrue(b'--replace' in errors and b'--output-dir' in errors)
+        with open(names[0]) as f:
+            self.assertEqual(f.read(), SOURCES['a.js'])
+
+        output = os.path.join(self.directory, 'out')
+        subprocess.check_output(command + ['--output-dir=' + output] + names, cwd=root, env=env)
+        self.assertTrue(os.path.exists(os.path.join(output, 'a.js')))
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, 'src')
+        for name, code in SOURCES.items():
+            path = os.path.join(self.source, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as f:
+                f.write(code)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
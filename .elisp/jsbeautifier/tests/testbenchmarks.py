@@ -0,0 +1,39 @@
+import json
+import unittest
+import jsbeautifier
+from jsbeautifier import benchmarks
+from jsbeautifier.benchmarks import benchstrings, suite
+from jsbeautifier.unpackers import packer
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_corpus(self):
+        for name, generate, settings in suite.CATEGORIES:
+            self.assertTrue(len(generate(1000)) >= 1000, name)
+
+    def test_packed(self):
+        source = benchmarks.packed(1000)
+        self.assertTrue(packer.detect(source))
+        self.assertEqual(packer.unpack(source), benchmarks.minified(1000))
+
+    @unittest.skipIf(benchstrings.tracemalloc is None, 'no tracemalloc')
+    def test_literal_memory(self):
+        # scanning a literal full of escapes takes memory in proportion to
+        # the literal, not to the number of escapes in it
+        for source in ['var s = "%s";' % ('\\x41' * 65536),
+                       'var r = /%s/;' % ('[\\/]\\/' * 65536)]:
+            peak = benchstrings.peak(lambda: jsbeautifier.beautify(source))
+            self.assertTrue(peak * 1048576 < 8 * len(source), peak)
+
+    def test_run(self):
+        results = suite.run(size = 100, repeat = 1, categories = ['minified', 'packed'])
+        self.assertEqual(sorted(results['results']), ['minified', 'packed'])
+        for result in results['results'].values():
+            self.assertTrue(result['tokens'] > 0)
+            self.assertTrue(result['bytes'] >= 100)
+        # results are saved as JSON
+        self.assertEqual(json.loads(json.dumps(results)), results)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+import jsbeautifier
+import jsbeautifier.cache
+
+
+class TestResultCache(unittest.TestCase):
+    def test_beautify(self):
+        cache = jsbeautifier.cache.get_cache(self.options)
+        source = u'var a="•",b=[1,2];if(a){b()}'
+
+        first = jsbeautifier.beautify(source, self.options)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        self.assertEqual(jsbeautifier.beautify(source, self.options), first)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        self.options.indent_size = 2
+        self.assertNotEqual(jsbeautifier.beautify(source, self.options), first)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_beautify_file(self):
+        cache = jsbeautifier.cache.get_cache(self.options)
+        path = os.path.join(self.directory, 'a.js')
+        with open(path, 'w') as f:
+            f.write('function f(){return 1}')
+
+        expected = jsbeautifier.beautify_file(path)
+        self.assertEqual(jsbeautifier.beautify_file(path, self.options), expected)
+        self.assertEqual(jsbeautifier.beautify_file(path, self.options), expected)
+        self.assertEqual(jsbeautifier.beautify_file(path, self.options, use_mmap=True), expected)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+        with open(path, 'w') as f:
+            f.write('function g(){return 1}')
+        self.assertEqual(jsbeautifier.beautify_file(path, self.options),
+                         'function g() {\n    return 1\n}')
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+    def test_non_ascii(self):
+        # byte strings on Python 2, text on Python 3: hits give back the
+        # type a miss gives
+        cache = jsbeautifier.cache.get_cache(self.options)
+        source = 'var a="\xe2\x80\xa2";' if str is bytes else u'var a="\u2022";'
+        expected = jsbeautifier.beautify(source)
+        for i in range(2):
+            result = jsbeautifier.beautify(source, self.options)
+            self.assertEqual(result, expected)
+            self.assertEqual(type(result), type(expected))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        if str is bytes:
+            self.assertEqual(jsbeautifier.beautify(source.decode('utf8'), self.options),
+                             expected.decode('utf8'))
+            self.assertEqual(type(jsbeautifier.beautify(source.decode('utf8'), self.options)),
+                             type(u''))
+
+        cache.hits = cache.misses = 0
+        path = os.path.join(self.directory, 'a.js')
+        with open(path, 'wb') as f:
+            f.write(b'var a="\xe2\x80\xa2";')
+        expected = jsbeautifier.beautify_file(path)
+        for use_mmap in [False, False, True, True]:
+            result = jsbeautifier.beautify_file(path, self.options, use_mmap)
+            self.assertEqual(result, expected)
+            self.assertEqual(type(result), type(expected))
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+
+    def test_unpackers(self):
+        # results depend on the unpackers which ran: turning one off, or
+        # registering another, must not serve what they gave before
+        from jsbeautifier import unpackers
+        from jsbeautifier.unpackers.tests.testregistry import SHOUTING
+        cache = jsbeautifier.cache.get_cache(self.options)
+        source = 'var%20a%3D1%3B'
+        self.assertEqual(jsbeautifier.beautify(source, self.options), 'var a = 1;')
+        unpackers.enable('jsbeautifier.unpackers.urlencode', False)
+        try:
+            self.assertEqual(jsbeautifier.beautify(source, self.options),
+                             'var % 20a % 3D1 % 3B')
+        finally:
+            unpackers.enable('jsbeautifier.unpackers.urlencode')
+        self.assertEqual(jsbeautifier.beautify(source, self.options), 'var a = 1;')
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+        unpackers.register(SHOUTING, 'shouting')
+        try:
+            self.assertEqual(jsbeautifier.beautify(source, self.options), 'var a = 1;')
+        finally:
+            unpackers.unregister('shouting')
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+        self.options.unpack = False
+        self.assertEqual(jsbeautifier.beautify(source, self.options), 'var % 20a % 3D1 % 3B')
+
+    def test_eviction(self):
+        self.options.cache_size = 250
+        cache = jsbeautifier.cache.get_cache(self.options)
+        sources = ['var a%d = "%s";' % (i, 'x' * 100) for i in range(3)]
+        for source in sources:
+            jsbeautifier.beautify(source, self.options)
+            # make the order of use unambiguous
+            for mtime, size, path in cache._entries():
+                os.utime(path, (mtime - 10, mtime - 10))
+
+        self.assertEqual(cache.evictions, 1)
+        jsbeautifier.beautify(sources[2], self.options)
+        jsbeautifier.beautify(sources[0], self.options)
+        self.assertEqual((cache.hits, cache.misses), (1, 4))
+        for dirpath, dirnames, filenames in os.walk(self.options.cache_dir):
+            self.assertEqual([name for name in filenames if name.endswith('.tmp')], [])
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.options = jsbeautifier.default_options()
+        self.options.cache_dir = os.path.join(self.directory, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import sys
+import threading
+import unittest
+import jsbeautifier
+
+SOURCES = [
+    'var a=1, b=c[d], e=6;',
+    'if(1){2}else{3}',
+    "a = [\n    [1, 2],\n  [3, 4]\n];x = {a:1,b:[{c:2}]}",
+    'function f(a,b){return /re[/]x/g.test("\\x41"+\'\\u0041\')}/* c\n * d\n */foo()',
+    'switch(a){case 1:b();break;default:c()}// done',
+    '#!/usr/bin/env node\nvar x = 1e-10, y = 2E+5; do{x++}while(x<y)',
+]
+
+OUTPUT = os.path.join(os.path.dirname(jsbeautifier.__file__),
+                      'unpackers', 'tests', 'test-myobfuscate-output.js')
+
+
+class TestJSBeautifierConcurrency(unittest.TestCase):
+    def options(self, tokenizer, keep_array_indentation, unescape_strings):
+        options = jsbeautifier.default_options()
+        options.tokenizer = tokenizer
+        options.keep_array_indentation = keep_array_indentation
+        options.unescape_strings = unescape_strings
+        return options
+
+    def test_parallel_beautify(self):
+        sources = list(SOURCES)
+        with open(OUTPUT) as data:
+            sources.append(data.read())
+
+        jobs = []
+        for tokenizer in ['regex', 'classic']:
+            for keep_array_indentation in [False, True]:
+                # one options object shared by every thread using it
+                options = self.options(tokenizer, keep_array_indentation, True)
+                for source in sources:
+                    jobs.append((source, options))
+
+        expected = [jsbeautifier.beautify(source, options) for source, options in jobs]
+
+        results = {}
+        errors = []
+        def worker(offset):
+            try:
+                for rounds in range(10):
+                    for i in range(offset, len(jobs), 8):
+                        source, options = jobs[i]
+                        results.setdefault(i, []).append(jsbeautifier.beautify(source, options))
+            except Exception as ex:
+                errors.append(ex)
+
+        switch = getattr(sys, 'getswitchinterval', None)
+        if switch:
+            old_interval = sys.getswitchinterval()
+            sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=worker, args=(i % 8,)) for i in range(16)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            if switch:
+                sys.setswitchinterval(old_interval)
+
+        self.assertEqual(errors, [])
+        for i, outputs in results.items():
+            self.assertEqual(len(outputs), 20)
+            for output in outputs:
+                self.assertEqual(output, expected[i])
+
+
+if __name__ == '__main__':
+    unittest.main()
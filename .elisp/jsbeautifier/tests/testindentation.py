@@ -20,6 +20,50 @@ class TestJSBeautifierIndentation(unittest.TestCase):
         self.options.keep_function_indentation = 0;
         test_fragment('var foo = function(){ baz() }();', "var foo = function() {\n\tbaz()\n}();");
 
+    def test_output_buffer(self):
+        output = jsbeautifier.OutputBuffer('  ', '\t')
+        output.append('a')
+        output.append('\n')
+        output.append_indentation(True, 3)
+        # one fragment for the whole indentation, seen as its last piece
+        self.assertEqual(len(output), 3)
+        self.assertEqual(output.last(), '  ')
+        output.remove_last()
+        output.remove_last()
+        self.assertEqual(''.join(output), 'a\n\t  ')
+        output.remove_last()
+        self.assertEqual(output.last(), '\t')
+        output.append_indentation(False, 2)
+        output.append(' ')
+        output.trim()
+        self.assertEqual(output.finish(), 'a')
+
+    def test_indentation_spaces(self):
+        output = jsbeautifier.OutputBuffer('    ')
+        output.append('[')
+        output.append('\n')
+        output.append_indentation(False, 2, 3)
+        self.assertEqual(len(output), 3)
+        self.assertTrue(output.indentation(False, 2, 3) is output[-1])
+        self.assertEqual(output.last(), ' ')
+        output.remove_last()
+        self.assertEqual(''.join(output), '[\n' + ' ' * 10)
+
+        options = jsbeautifier.default_options()
+        options.keep_array_indentation = True
+        for tokenizer in ['regex', 'classic']:
+            options.tokenizer = tokenizer
+            self.assertEqual(jsbeautifier.beautify('a = [\n  1,\n     2\n]', options),
+                             'a = [\n    1,\n       2\n    ]')
+
+    def test_deep_nesting(self):
+        depth = 40
+        source = '{' * depth + 'a()' + '}' * depth
+        result = jsbeautifier.beautify(source, self.options)
+        lines = result.split('\n')
+        self.assertEqual(lines[depth], ' ' * 4 * depth + 'a()')
+        self.assertEqual(lines[-1], '}')
+
     def decodesto(self, input, expectation=None):
         self.assertEqual(
             jsbeautifier.beautify(input, self.options), expectation or input)
@@ -39,5 +83,13 @@ class TestJSBeautifierIndentation(unittest.TestCase):
         cls.wrapregex = re.compile('^(.+)$', re.MULTILINE)
 
 
+class TestJSBeautifierIndentationClassicTokenizer(TestJSBeautifierIndentation):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestJSBeautifierIndentationClassicTokenizer, cls).setUpClass()
+        cls.options.tokenizer = 'classic'
+
+
 if __name__ == '__main__':
     unittest.main()
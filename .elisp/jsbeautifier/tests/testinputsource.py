@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+import jsbeautifier
+
+
+class TestMmapInputSource(unittest.TestCase):
+    def write(self, name, data):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_beautify_file(self):
+        path = self.write('a.js', u'var a="•—",b=[1,2];if(a){b()}'.encode('utf8'))
+        mapped = jsbeautifier.beautify_file(path, use_mmap=True)
+        self.assertEqual(mapped, jsbeautifier.beautify_file(path))
+        self.assertEqual(type(mapped), type(jsbeautifier.beautify_file(path)))
+        self.assertEqual(jsbeautifier.beautify_file(self.write('empty.js', b''), use_mmap=True), '')
+
+    def test_windows(self):
+        data = u'"ä•"/*—*/x'.encode('utf8')
+        for window_size in [1, 2, 3, 4]:
+            source = jsbeautifier.MmapInputSource(self.write('w.js', data), window_size)
+            chunks = []
+            while True:
+                chunk = source.read()
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            source.close()
+            # the type open() gives: UTF-8 str on Python 2
+            self.assertEqual(''.join(chunks), data if str is bytes else data.decode('utf8'))
+
+    def test_invalid_utf8(self):
+        path = self.write('bad.js', b'var a = 1;\nvar b = "\xc3\x28";')
+        for window_size in [3, 4, 100]:
+            source = jsbeautifier.MmapInputSource(path, window_size)
+            with self.assertRaises(jsbeautifier.InputError) as context:
+                while source.read():
+                    pass
+            source.close()
+            self.assertTrue('invalid UTF-8 at byte 20' in str(context.exception))
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,12 @@ import re
 import unittest
 import jsbeautifier
 
+# Python 2 retrocompatibility
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
 class TestJSBeautifier(unittest.TestCase):
     def test_unescape(self):
         # Test cases contributed by <chrisjshull on GitHub.com>
@@ -486,5 +492,44 @@ class TestJSBeautifier(unittest.TestCase):
         cls.wrapregex = re.compile('^(.+)$', re.MULTILINE)
 
 
+class TestJSBeautifierClassicTokenizer(TestJSBeautifier):
+    # the character-by-character tokenizer must produce the same output
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestJSBeautifierClassicTokenizer, cls).setUpClass()
+        cls.options.tokenizer = 'classic'
+
+
+class TestJSBeautifierStreaming(TestJSBeautifier):
+    # flush after every token: the joined chunks must match the usual output
+
+    def test_chunks(self):
+        chunks = list(jsbeautifier.beautify_iter('if(1){2}else{3}\n\n\nfoo();'))
+        self.assertTrue(len(chunks) > 2)
+        self.assertEqual(''.join(chunks), 'if (1) {\n    2\n} else {\n    3\n}\n\n\nfoo();')
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestJSBeautifierStreaming, cls).setUpClass()
+        cls.flush_size = jsbeautifier.Beautifier.output_flush_size
+        jsbeautifier.Beautifier.output_flush_size = 1
+
+    @classmethod
+    def tearDownClass(cls):
+        jsbeautifier.Beautifier.output_flush_size = cls.flush_size
+
+
+class TestJSBeautifierInputSource(TestJSBeautifier):
+    # tiny windows put every peek and escape sequence across a boundary
+
+    def decodesto(self, input, expectation=None):
+        for window_size in [1, 2, 3, 5]:
+            source = jsbeautifier.InputSource(StringIO(input), window_size)
+            b = jsbeautifier.Beautifier()
+            self.assertEqual(
+                ''.join(b.beautify_iter(source, self.options)), expectation or input)
+
+
 if __name__ == '__main__':
     unittest.main()
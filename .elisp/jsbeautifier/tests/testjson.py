@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import unittest
+import jsbeautifier
+import jsbeautifier.jsonmode
+
+DOCUMENTS = [
+    '{}',
+    '[]',
+    '"text"',
+    '-1.5e+3',
+    '{"a":1,"b":[1,-2,{"c":null}],"d":{"e":[[1,2],[3]],"f":{}}}',
+    '[{"a":1},2,{"b":[]},[[true,false]]]',
+    '  {\n  "a": [\n    1,\n\n\n    2e+5,\n    -3\n  ],\n  "b": "\\u0041\\n\\"x\\""\n}\n',
+]
+
+NOT_JSON = [
+    '',
+    'var a = {"b": 1};',
+    '{a: 1}',
+    '[1, 2,]',
+    '{"a": 1} {"b": 2}',
+    "['single']",
+    '[1, 2] // done',
+    '{"a": 01}',
+]
+
+
+class TestJSONMode(unittest.TestCase):
+    def options(self, **settings):
+        opts = jsbeautifier.default_options()
+        for name, value in settings.items():
+            setattr(opts, name, value)
+        return opts
+
+    def fast(self, source, opts):
+        # the fast path alone, None if it does not take source
+        stripped = source.lstrip(' \t')
+        b = jsbeautifier.Beautifier(opts)
+        b.preindent_string = source[:len(source) - len(stripped)]
+        result = jsbeautifier.jsonmode.beautify(b, stripped)
+        if result is not None:
+            return b.preindent_string + result
+
+    def test_same_as_general_path(self):
+        for settings in [{}, {'brace_style': 'expand'}, {'brace_style': 'end-expand'},
+                         {'preserve_newlines': False}, {'max_preserve_newlines': 0},
+                         {'unescape_strings': True}, {'indent_size': 2, 'tokenizer': 'classic'}]:
+            opts = self.options(**settings)
+            for source in DOCUMENTS:
+                expected = jsbeautifier.beautify(source, opts)
+                self.assertEqual(jsbeautifier.beautify_json(source, opts), expected, (source, settings))
+                self.assertEqual(self.fast(source, opts), expected)
+        self.assertFalse(opts.json)
+
+    def test_fallback(self):
+        for source in NOT_JSON:
+            self.assertEqual(self.fast(source, self.options()), None, source)
+            self.assertEqual(jsbeautifier.beautify_json(source), jsbeautifier.beautify(source))
+        # keep_array_indentation copies the input layout: general path only
+        opts = self.options(keep_array_indentation=True)
+        self.assertEqual(self.fast('[1,\n  2]', opts), None)
+        self.assertEqual(jsbeautifier.beautify_json('[1,\n  2]', opts), jsbeautifier.beautify('[1,\n  2]', opts))
+
+    def test_no_unpacking(self):
+        # would be taken for urlencoded javascript on the general path
+        source = '["a%20b","%41%42%43%44"]'
+        self.assertEqual(jsbeautifier.beautify_json(source), source.replace(',', ', '))
+
+    def test_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'a.json')
+            with open(path, 'w') as f:
+                f.write(DOCUMENTS[4])
+            opts = self.options(json=True)
+            for use_mmap in [False, True]:
+                self.assertEqual(jsbeautifier.beautify_file(path, opts, use_mmap),
+                                 jsbeautifier.beautify(DOCUMENTS[4]))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_profile(self):
+        result, profile = jsbeautifier.beautify_profile(DOCUMENTS[4], self.options(json=True))
+        self.assertEqual(result, jsbeautifier.beautify(DOCUMENTS[4]))
+        self.assertTrue('json' in profile.times)
+        self.assertFalse('tokenize' in profile.times)
+
+
+if __name__ == '__main__':
+    unittest.main()
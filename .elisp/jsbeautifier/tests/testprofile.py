@@ -0,0 +1,38 @@
+import shutil
+import tempfile
+import unittest
+import jsbeautifier
+
+
+class TestProfile(unittest.TestCase):
+    def test_beautify_profile(self):
+        source = 'a=[1,[2,{b:3}]];f(a)'
+        result, profile = jsbeautifier.beautify_profile(source)
+        self.assertEqual(result, jsbeautifier.beautify(source))
+
+        self.assertEqual(profile.tokens['TK_START_EXPR'], 3)
+        self.assertEqual(profile.tokens['TK_START_BLOCK'], 1)
+        self.assertEqual(profile.tokens['TK_WORD'], 7)
+        self.assertEqual(profile.tokens['TK_STRING'], 0)
+        self.assertEqual(profile.max_depth, 4)
+        for phase in ['unpack', 'tokenize', 'handle_word', 'handle_start_expr', 'join']:
+            self.assertTrue(phase in profile.times, phase)
+        self.assertTrue(profile.report().endswith('max mode stack depth           4\n'))
+
+    def test_callback(self):
+        profiles = []
+        opts = jsbeautifier.default_options()
+        opts.profile = profiles.append
+        opts.cache_dir = tempfile.mkdtemp()
+        try:
+            # profiled runs do not use the cache, so they are all reported
+            jsbeautifier.beautify('if(a){b()}', opts)
+            jsbeautifier.beautify('if(a){b()}', opts)
+        finally:
+            shutil.rmtree(opts.cache_dir)
+        self.assertEqual(len(profiles), 2)
+        self.assertEqual(profiles[0].tokens, profiles[1].tokens)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,51 +2,455 @@
 # General code for JSBeautifier unpackers infrastructure. See README.specs
 #     written by Stefano Sanfilippo <a.little.coder@gmail.com>
 #
+# Unpackers other than the built-in ones can be added at runtime:
+#
+#   jsbeautifier.unpackers.register(my_unpacker, 'vendor', priority=2)
+#   jsbeautifier.unpackers.enable('jsbeautifier.unpackers.urlencode', False)
+#
+# or by any installed distribution, through an entry point:
+#
+#   entry_points={'jsbeautifier.unpackers': ['vendor = vendor_js.unpacker']}
+#
+# Sources packed several times over are unpacked layer by layer with
+#
+#   trace = []
+#   jsbeautifier.unpackers.run(source, depth=8, trace=trace)
+#
 
 """General code for JSBeautifier unpackers infrastructure."""
 
-import pkgutil
+import collections
+import os
 import re
-from jsbeautifier.unpackers import evalbased
+import sys
+import tempfile
+import threading
+import warnings
 
 # NOTE: AT THE MOMENT, IT IS DEACTIVATED FOR YOUR SECURITY: it runs js!
 BLACKLIST = ['jsbeautifier.unpackers.evalbased']
 
+# the unpackers shipped with jsbeautifier, which need no search of the
+# unpackers dir to be found
+BUILTIN = ['jsbeautifier.unpackers.javascriptobfuscator',
+           'jsbeautifier.unpackers.myobfuscate',
+           'jsbeautifier.unpackers.packer',
+           'jsbeautifier.unpackers.urlencode']
+
+# group of the entry points through which distributions add unpackers
+ENTRY_POINT_GROUP = 'jsbeautifier.unpackers'
+
+# the file the entry points found are kept in, so that distributions which
+# declare some only have to be searched again once their entry_points.txt
+# change: $JSBEAUTIFIER_ENTRY_POINT_CACHE if set (empty to search them in
+# every process), else under the user's cache directory. Nothing is written
+# while no distribution declares any.
+ENTRY_POINT_CACHE = os.environ.get('JSBEAUTIFIER_ENTRY_POINT_CACHE', os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'jsbeautifier', 'entry_points.json')) or None
+
+_registry = []
+_discovered = False
+_unpackers = None
+_fingerprint = None
+
+# held while the registry is filled or changed
+_lock = threading.RLock()
+
+# os.rename does not replace existing files on Windows
+_replace = getattr(os, 'replace', os.rename)
+
+# characters at the start of the source prescan() looks at
+PRESCAN_SIZE = 4096
+
+# layers run() remembers between calls, by hash of their source, so that
+# payloads met again are not unpacked again
+LAYER_CACHE_SIZE = 64
+
+_layers = collections.OrderedDict()
+
 class UnpackingError(Exception):
     """Badly packed source or general error. Argument is a
     meaningful description."""
     pass
 
+class Registration(object):
+    """An unpacker in the registry: any object (usually a module) with
+    detect(source) and unpack(source), and optionally prescan(head), known
+    under `name`. Lower priorities run first; disabled ones do not run."""
+
+    def __init__(self, name, unpacker, priority, enabled=True):
+        self.name = name
+        self.unpacker = unpacker
+        self.priority = priority
+        self.enabled = enabled
+
+    def __repr__(self):
+        return '<Registration %s, priority %s%s>' % (
+            self.name, self.priority, '' if self.enabled else ', disabled')
+
+class Layer(object):
+    """One pass of run() over a source of `size` characters hashed to
+    `digest`: the `names` of the unpackers which applied and the size of
+    what they gave, `unpacked_size`. `cached` if the pass was remembered
+    from an earlier one; `error` is the UnpackingError which ended it."""
+
+    def __init__(self, depth, digest, size, names, unpacked_size, cached=False, error=None):
+        self.depth = depth
+        self.digest = digest
+        self.size = size
+        self.names = names
+        self.unpacked_size = unpacked_size
+        self.cached = cached
+        self.error = error
+
+    def __repr__(self):
+        return '<Layer %d: %s, %d -> %d characters%s>' % (
+            self.depth, ', '.join(self.names) or 'nothing', self.size,
+            self.unpacked_size, ' (cached)' if self.cached else '')
+
+def register(unpacker, name=None, priority=None, enabled=True):
+    """Adds `unpacker` to the registry, replacing any registered under the
+    same `name` (default: its __name__). `priority` defaults to its
+    PRIORITY. Returns the Registration."""
+    if not callable(getattr(unpacker, 'detect', None)) \
+       or not callable(getattr(unpacker, 'unpack', None)):
+        raise UnpackingError('Bad unpacker: %r' % (unpacker,))
+    if name is None:
+        name = getattr(unpacker, '__name__', None) or type(unpacker).__name__
+    if priority is None:
+        priority = getattr(unpacker, 'PRIORITY', None)
+        if priority is None:
+            raise UnpackingError('Unpacker %s has no priority' % name)
+    registration = Registration(name, unpacker, priority, enabled)
+    with _lock:
+        unregister(name)
+        _registry.append(registration)
+    return registration
+
+def unregister(name):
+    """Removes the unpacker registered under `name`, if any."""
+    global _unpackers
+    with _lock:
+        _discover()
+        _registry[:] = [registration for registration in _registry
+                        if registration.name != name]
+        _unpackers = None
+        _layers.clear()
+
+def enable(name, enabled=True):
+    """Turns the unpacker registered under `name` on or off."""
+    global _unpackers
+    with _lock:
+        for registration in registry():
+            if registration.name == name:
+                registration.enabled = enabled
+                _unpackers = None
+                _layers.clear()
+                return
+    raise UnpackingError('No unpacker named %s' % name)
+
+def registry():
+    """Returns every Registration, enabled or not, in the order they are
+    tried: by priority, then in the order they were registered."""
+    with _lock:
+        _discover()
+        return sorted(_registry, key = lambda registration: registration.priority)
+
 def getunpackers():
-    """Scans the unpackers dir, finds unpackers and add them to UNPACKERS list.
-    An unpacker will be loaded only if it is a valid python module (name must
-    adhere to naming conventions) and it is not blacklisted (i.e. inserted
-    into BLACKLIST."""
-    path = __path__
-    prefix = __name__ + '.'
-    unpackers = []
+    """Returns the enabled unpackers, by priority. Nothing is imported before
+    the first call, and later calls return the same list until the
+    registry changes."""
+    global _unpackers
+    unpackers = _unpackers
+    if unpackers is None:
+        with _lock:
+            if _unpackers is None:
+                _unpackers = [registration.unpacker for registration in registry()
+                              if registration.enabled]
+            unpackers = _unpackers
+    return unpackers
+
+def fingerprint():
+    """Returns a string which changes whenever the unpackers run() uses do:
+    their names, their order and the files their code was loaded from, so
+    that results kept across runs are not served for another set."""
+    global _fingerprint
+    unpackers = getunpackers()
+    found = _fingerprint
+    if found is None or found[0] is not unpackers:
+        found = unpackers, repr([[_name(unpacker)] + _identity(unpacker)
+                                 for unpacker in unpackers])
+        _fingerprint = found
+    return found[1]
+
+def _identity(unpacker):
+    """The module or class of `unpacker` and, unless it is part of
+    jsbeautifier (whose code the result cache keys on already), the file it
+    was loaded from with its modification time and size."""
+    if isinstance(unpacker, type(sys)):
+        name, module = unpacker.__name__, unpacker
+    else:
+        name = '%s.%s' % (type(unpacker).__module__, type(unpacker).__name__)
+        module = sys.modules.get(type(unpacker).__module__)
+    if getattr(module, '__name__', '').startswith('jsbeautifier.'):
+        return [name]
+    filename = getattr(module, '__file__', None)
+    try:
+        stat = os.stat(filename)
+    except (TypeError, OSError):
+        return [name, filename]
+    return [name, filename, stat.st_mtime, stat.st_size]
+
+def _discover():
+    """Fills the registry, once, with the BUILTIN unpackers, any other
+    module dropped in the unpackers dir and the entry points of installed
+    distributions. An unpacker will be loaded only if it is a valid python
+    module (name must adhere to naming conventions) and it is not
+    blacklisted (i.e. inserted into BLACKLIST). Unpackers other than the
+    BUILTIN ones which fail to load are left out with a warning."""
+    global _discovered
+    with _lock:
+        if _discovered:
+            return
+        found = [(modname, modname) for modname in BUILTIN]
+        found.extend((modname, modname) for modname in _dropped())
+        found.extend((name, value) for name, value in _entry_points()
+                     if name not in BLACKLIST and value.split(':')[0] not in BLACKLIST)
+        registrations = []
+        for name, value in found:
+            try:
+                unpacker = _load(value)
+                if not hasattr(unpacker, 'PRIORITY'):
+                    raise UnpackingError('Bad unpacker: %s' % name)
+            except Exception as error:
+                if name in BUILTIN:
+                    raise
+                warnings.warn('Cannot load unpacker %s: %s' % (name, error), RuntimeWarning)
+                continue
+            registrations.append(Registration(name, unpacker, unpacker.PRIORITY))
+        _registry.extend(registrations)
+        _discovered = True
+
+def _dropped():
+    """Names of the modules in the unpackers dir which are not BUILTIN."""
+    modnames = []
+    for path in __path__:
+        try:
+            filenames = sorted(os.listdir(path))
+        except OSError:
+            continue
+        for filename in filenames:
+            name, extension = os.path.splitext(filename)
+            modname = __name__ + '.' + name
+            if extension == '.py' and name != '__init__' and 'tests' not in modname \
+               and modname not in BUILTIN and modname not in BLACKLIST \
+               and modname not in modnames:
+                modnames.append(modname)
+    return modnames
+
+def _load(value):
+    """Imports 'module' or 'module:attribute'."""
+    modname, _colon, attribute = value.partition(':')
     interface = ['unpack', 'detect', 'PRIORITY']
-    for _importer, modname, _ispkg in pkgutil.iter_modules(path, prefix):
-        if 'tests' not in modname and modname not in BLACKLIST:
+    try:
+        unpacker = __import__(modname.strip(), fromlist=interface)
+        for part in attribute.strip().split('.') if attribute.strip() else []:
+            unpacker = getattr(unpacker, part)
+    except (ImportError, AttributeError):
+        raise UnpackingError('Bad unpacker: %s' % value)
+    return unpacker
+
+def _entry_points():
+    """(name, 'module:attribute') of every ENTRY_POINT_GROUP entry point.
+    The installed distributions are only searched if the entry_points.txt of
+    one of them mentions the group, and only once per change of those files
+    if ENTRY_POINT_CACHE is set."""
+    key = _declarations()
+    if key == []:
+        return []
+    cache = ENTRY_POINT_CACHE if key is not None else None
+    if cache:
+        import json
+        try:
+            with open(cache) as data:
+                cached = json.load(data)
+            if cached['key'] == key:
+                return [tuple(entry_point) for entry_point in cached['entry_points']]
+        except (EnvironmentError, ValueError, KeyError, TypeError):
+            pass
+
+    found = _scan_entry_points()
+
+    if cache:
+        try:
+            directory = os.path.dirname(cache)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            handle, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
             try:
-                module = __import__(modname, fromlist=interface)
-            except ImportError:
-                raise UnpackingError('Bad unpacker: %s' % modname)
-            else:
-                unpackers.append(module)
+                with os.fdopen(handle, 'w') as data:
+                    json.dump({'key': key, 'entry_points': found}, data)
+                _replace(temporary, cache)
+            finally:
+                if os.path.exists(temporary):
+                    os.remove(temporary)
+        except EnvironmentError:
+            pass
+    return found
 
-    return sorted(unpackers, key = lambda mod: mod.PRIORITY)
+def _declarations():
+    """[path, mtime] of the entry_points.txt of the distributions in the
+    directories on sys.path which mention ENTRY_POINT_GROUP, or None if
+    sys.path holds zip files, whose distributions are not looked into."""
+    declarations = []
+    for path in sorted(set(os.path.abspath(path) for path in sys.path)):
+        if os.path.isfile(path):
+            return None
+        try:
+            names = os.listdir(path)
+        except OSError:
+            continue
+        infos = [name for name in names if name.endswith(('.dist-info', '.egg-info'))]
+        if path.endswith('.egg'):
+            infos.append('EGG-INFO')
+        for name in sorted(infos):
+            filename = os.path.join(path, name, 'entry_points.txt')
+            try:
+                with open(filename, 'rb') as data:
+                    if ENTRY_POINT_GROUP.encode('ascii') not in data.read():
+                        continue
+                declarations.append([filename, os.path.getmtime(filename)])
+            except EnvironmentError:
+                pass
+    return declarations
 
-UNPACKERS = getunpackers()
+def _scan_entry_points():
+    """Searches the installed distributions for ENTRY_POINT_GROUP entry points."""
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        try:
+            from pkg_resources import iter_entry_points
+        except ImportError:
+            return []
+        return sorted([entry_point.name, '%s:%s' % (
+            entry_point.module_name, '.'.join(entry_point.attrs))]
+                      for entry_point in iter_entry_points(ENTRY_POINT_GROUP))
+    selected = entry_points()
+    if hasattr(selected, 'select'):
+        selected = selected.select(group=ENTRY_POINT_GROUP)
+    else:
+        selected = selected.get(ENTRY_POINT_GROUP, [])
+    return sorted([entry_point.name, entry_point.value] for entry_point in selected)
 
-def run(source, evalcode=False):
-    """Runs the applicable unpackers and return unpacked source as a string."""
-    for unpacker in [mod for mod in UNPACKERS if mod.detect(source)]:
-        source = unpacker.unpack(source)
-    if evalcode and evalbased.detect(source):
-        source = evalbased.unpack(source)
+def prescan(source, unpackers=None):
+    """Returns the unpackers (default: getunpackers()) which may apply to source,
+    judging by its first PRESCAN_SIZE characters only. The detect() of an
+    unpacker, which may look at all of the source, only needs to run if
+    its prescan() passes; unpackers without a prescan() always do."""
+    head = source[:PRESCAN_SIZE]
+    if unpackers is None:
+        unpackers = getunpackers()
+    return [mod for mod in unpackers
+            if not hasattr(mod, 'prescan') or mod.prescan(head)]
+
+def run(source, evalcode=False, depth=1, trace=None):
+    """Runs the applicable unpackers and return unpacked source as a string.
+    Up to `depth` passes are made, each one over what the last one gave,
+    until the source stops changing or comes back to an earlier layer. A
+    Layer is appended to the list `trace`, if given, for each pass.
+    An UnpackingError past the first pass ends unpacking there."""
+    if depth <= 1 and trace is None:
+        return _unpack_layer(source, evalcode)[0]
+
+    seen = set()
+    unpackers = getunpackers()
+    for level in range(1, depth + 1):
+        digest = _digest(source)
+        if digest in seen:
+            break
+        seen.add(digest)
+        key = (digest, evalcode)
+        with _lock:
+            # moved to the end: the least recently used layer goes first
+            # (OrderedDict.move_to_end is missing on Python 2)
+            layer = _layers.pop(key, None)
+            if layer is not None:
+                _layers[key] = layer
+        cached = layer is not None
+        try:
+            if cached:
+                unpacked, names = layer
+            else:
+                unpacked, names = _unpack_layer(source, evalcode)
+        except UnpackingError as error:
+            if level == 1:
+                raise
+            if trace is not None:
+                trace.append(Layer(level, digest, len(source), [], len(source), error=error))
+            break
+        if not cached:
+            with _lock:
+                # not if the unpackers changed while this layer was unpacked
+                if _unpackers is unpackers:
+                    _layers[key] = unpacked, names
+                    while len(_layers) > LAYER_CACHE_SIZE:
+                        _layers.popitem(last=False)
+        if trace is not None:
+            trace.append(Layer(level, digest, len(source), names, len(unpacked), cached))
+        if unpacked == source:
+            break
+        source = unpacked
     return source
 
+def _unpack_layer(source, evalcode):
+    """One pass of the applicable unpackers: the unpacked source and the
+    names of the unpackers which applied."""
+    names = []
+    for unpacker in [mod for mod in prescan(source) if mod.detect(source)]:
+        source = unpacker.unpack(source)
+        names.append(_name(unpacker))
+    if evalcode:
+        from jsbeautifier.unpackers import evalbased
+        if prescan(source, [evalbased]) and evalbased.detect(source):
+            source = evalbased.unpack(source)
+            names.append(evalbased.__name__)
+    return source, names
+
+def _name(unpacker):
+    """The name `unpacker` is registered under."""
+    for registration in _registry:
+        if registration.unpacker is unpacker:
+            return registration.name
+    return getattr(unpacker, '__name__', type(unpacker).__name__)
+
+def _digest(source):
+    import hashlib
+    if not isinstance(source, bytes):
+        source = source.encode('utf-8')
+    return hashlib.sha256(source).hexdigest()
+
+def detect(source, evalcode=False):
+    """Returns True if any of the unpackers run() would apply detects source."""
+    if any(mod.detect(source) for mod in prescan(source)):
+        return True
+    if not evalcode:
+        return False
+    from jsbeautifier.unpackers import evalbased
+    return bool(prescan(source, [evalbased])) and evalbased.detect(source)
+
+def ruled_out(head, evalcode=False):
+    """Returns True if `head`, the first PRESCAN_SIZE characters of a source
+    (all of it if shorter), is enough to tell that run() leaves the source
+    as it is: no prescan() of the unpackers which would run passes."""
+    if prescan(head):
+        return False
+    if not evalcode:
+        return True
+    from jsbeautifier.unpackers import evalbased
+    return not prescan(head, [evalbased])
+
 def filtercomments(source):
     """NOT USED: strips trailing comments and put them at the top."""
     trailing_comments = []
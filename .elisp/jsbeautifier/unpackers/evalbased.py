@@ -9,22 +9,86 @@
 # if detect(some_string):
 #     unpacked = unpack(some_string)
 #
+# Every unpack() starts an interpreter of its own. Batch jobs can keep some
+# running instead:
+#
+# evalbased.pool = evalbased.Pool(size=4, timeout=5)
+# ...
+# evalbased.pool.close()
+#
 
 """Unpacker for eval() based packers: runs JS code and returns result.
 Works only if a JS interpreter (e.g. Mozilla's Rhino) is installed and
 properly set up on host."""
 
+import os
+import threading
 from subprocess import PIPE, Popen
 
+# Python 2 retrocompatibility
+# pylint: disable=F0401
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+# resource limits exist on POSIX only
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from jsbeautifier.unpackers import UnpackingError
+
 PRIORITY = 3
 
+# the Pool unpack() evaluates code in, if any
+pool = None
+
+# Run by each interpreter of a Pool. Requests and responses are framed by
+# line count: the number of lines, then the lines. An expression comes in,
+# 'ok' or 'error' and the lines of its value or exception go out.
+DRIVER = r"""
+var line;
+while ((line = readline()) !== null) {
+    var count = parseInt(line, 10), lines = [], status = 'ok', result;
+    for (var i = 0; i < count; i++) {
+        lines.push(readline());
+    }
+    try {
+        result = String((0, eval)(lines.join('\n')));
+    } catch (error) {
+        status = 'error';
+        result = String(error);
+    }
+    result = result.split('\n');
+    print(status + ' ' + result.length + '\n' + result.join('\n'));
+}
+"""
+
+class EvaluationError(UnpackingError):
+    """The interpreter could not evaluate the code: it raised, timed out,
+    died or could not be started."""
+    pass
+
+def prescan(head):
+    """False if the first characters of the source, `head`, rule out detect()."""
+    return 'eval(function('.startswith(head.lstrip()[:14].lower())
+
 def detect(source):
     """Detects if source is likely to be eval() packed."""
     return source.strip().lower().startswith('eval(function(')
 
 def unpack(source):
     """Runs source and return resulting code."""
-    return jseval('print %s;' % source[4:]) if detect(source) else source
+    if not detect(source):
+        return source
+    if pool is not None:
+        try:
+            return pool.evaluate(source.strip()[4:])
+        except EvaluationError:
+            return source
+    return jseval('print %s;' % source[4:])
 
 # In case of failure, we'll just return the original, without crashing on user.
 def jseval(script):
@@ -37,3 +101,157 @@ def jseval(script):
     if interpreter.poll() or errors:
         return script
     return result
+
+
+class Pool(object):
+    """Up to `size` interpreters, started with `command` as they are needed
+    and kept running between evaluations. An evaluation taking longer than
+    `timeout` seconds kills its interpreter; interpreters are limited to
+    `memory_limit` bytes of address space where the OS allows (None for no
+    limit: JIT engines such as node reserve much more than they use), and
+    replaced after `max_evaluations` evaluations."""
+
+    def __init__(self, size=2, command=None, timeout=10, memory_limit=None,
+                 max_evaluations=100):
+        self.command = command or ['js', '-e', DRIVER]
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.max_evaluations = max_evaluations
+        self.workers = []
+        # the most recently used first, so that idle interpreters are reused
+        # before new ones are started
+        self.idle = queue.LifoQueue()
+        for i in range(size):
+            self.idle.put(None) # started on first use
+        self.lock = threading.Lock()
+
+    def evaluate(self, expression):
+        """Returns the value of javascript `expression` as a string, or
+        raises EvaluationError."""
+        worker = self.idle.get()
+        try:
+            if worker is None or not worker.alive():
+                worker = self._start()
+            result = worker.evaluate(expression, self.timeout)
+        except EvaluationError:
+            if worker is not None and not worker.alive():
+                self._stop(worker)
+                worker = None
+            raise
+        finally:
+            if worker is not None and worker.evaluations >= self.max_evaluations:
+                self._stop(worker)
+                worker = None
+            self.idle.put(worker)
+        return result
+
+    def close(self):
+        """Stops every interpreter. The pool starts new ones if used again."""
+        with self.lock:
+            workers, self.workers = self.workers, []
+        for worker in workers:
+            worker.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _start(self):
+        worker = Worker(self.command, self.memory_limit)
+        with self.lock:
+            self.workers.append(worker)
+        return worker
+
+    def _stop(self, worker):
+        worker.stop()
+        with self.lock:
+            if worker in self.workers:
+                self.workers.remove(worker)
+
+
+class Worker(object):
+    """An interpreter running DRIVER, and a thread reading its responses."""
+
+    def __init__(self, command, memory_limit=None):
+        # the limit is set from outside the interpreter: a preexec_fn is
+        # not safe to run in a process with threads
+        limit = memory_limit and resource is not None
+        if limit and not hasattr(resource, 'prlimit'):
+            command = ['/bin/sh', '-c', 'ulimit -v %d && exec "$@"' % (memory_limit // 1024),
+                       'sh'] + list(command)
+        self.devnull = open(os.devnull, 'wb')
+        try:
+            self.process = Popen(command, stdin=PIPE, stdout=PIPE, stderr=self.devnull)
+        except OSError as error:
+            self.devnull.close()
+            raise EvaluationError('Cannot start %s: %s' % (command[0], error))
+        if limit and hasattr(resource, 'prlimit'):
+            try:
+                resource.prlimit(self.process.pid, resource.RLIMIT_AS,
+                                 (memory_limit, memory_limit))
+            except (OSError, ValueError) as error:
+                self.stop()
+                raise EvaluationError('Cannot limit %s: %s' % (command[0], error))
+        self.evaluations = 0
+        self.responses = queue.Queue()
+        self.reader = threading.Thread(target=self._read)
+        self.reader.daemon = True
+        self.reader.start()
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def evaluate(self, expression, timeout=None):
+        lines = expression.split('\n')
+        request = '%d\n%s\n' % (len(lines), '\n'.join(lines))
+        self.evaluations += 1
+        try:
+            self.process.stdin.write(request.encode('utf-8'))
+            self.process.stdin.flush()
+        except (IOError, OSError, ValueError):
+            self.stop()
+            raise EvaluationError('Interpreter died')
+        try:
+            response = self.responses.get(timeout=timeout)
+        except queue.Empty:
+            self.stop()
+            raise EvaluationError('Evaluation timed out after %s s' % timeout)
+        if response is None:
+            self.stop()
+            raise EvaluationError('Interpreter died')
+        status, result = response
+        if status != 'ok':
+            raise EvaluationError(result)
+        return result
+
+    def stop(self):
+        if self.alive():
+            try:
+                self.process.kill()
+            except OSError:
+                pass
+        self.process.wait()
+        for stream in [self.process.stdin, self.process.stdout, self.devnull]:
+            try:
+                stream.close()
+            except (IOError, OSError):
+                pass
+
+    def _read(self):
+        """Puts (status, result) on self.responses for each response, then
+        None once the interpreter is gone or stops making sense."""
+        stdout = self.process.stdout
+        try:
+            while True:
+                header = stdout.readline().decode('utf-8').split()
+                if len(header) != 2 or not header[1].isdigit():
+                    break
+                lines = [stdout.readline() for i in range(int(header[1]))]
+                if lines and not lines[-1].endswith(b'\n'):
+                    break
+                self.responses.put((header[0], b''.join(lines)[:-1].decode('utf-8', 'replace')))
+        except (IOError, OSError, ValueError):
+            pass
+        self.responses.put(None)
@@ -20,25 +20,16 @@ import re
 
 PRIORITY = 1
 
+# a string literal, escapes and all; the closing " may be missing at the end
+STRING = re.compile(r'"((?:[^"\\]+|\\[\s\S])*)"?')
+
 def smartsplit(code):
     """Split `code` at " symbol, only if it is not escaped."""
-    strings = []
-    pos = 0
-    while pos < len(code):
-        if code[pos] == '"':
-            word = '' # new word
-            pos += 1
-            while pos < len(code):
-                if code[pos] == '"':
-                    break
-                if code[pos] == '\\':
-                    word += '\\'
-                    pos += 1
-                word += code[pos]
-                pos += 1
-            strings.append('"%s"' % word)
-        pos += 1
-    return strings
+    return ['"%s"' % match.group(1) for match in STRING.finditer(code)]
+
+def prescan(head):
+    """False if the first characters of the code, `head`, rule out detect()."""
+    return 'var _0x'.startswith(head[:7])
 
 def detect(code):
     """Detects if `code` is JavascriptObfuscator.com packed."""
@@ -53,6 +44,13 @@ def unpack(code):
             variable = matches.group(1)
             dictionary = smartsplit(matches.group(2))
             code = code[len(matches.group(0)):]
-            for key, value in enumerate(dictionary):
-                code = code.replace(r'%s[%s]' % (variable, key), value)
+
+            def lookup(reference):
+                """The string `variable`[key] stands for, if any."""
+                key = reference.group(1)
+                if str(int(key)) == key and int(key) < len(dictionary):
+                    return dictionary[int(key)]
+                return reference.group(0)
+
+            code = re.sub(r'%s\[(\d+)\]' % variable, lookup, code)
     return code
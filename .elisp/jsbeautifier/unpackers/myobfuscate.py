@@ -59,6 +59,11 @@ SIGNATURE = (r'["\x41\x42\x43\x44\x45\x46\x47\x48\x49\x4A\x4B\x4C\x4D\x4E\x4F'
              r'\x4F\x66","\x66\x72\x6F\x6D\x43\x68\x61\x72\x43\x6F\x64\x65","'
              r'\x6C\x65\x6E\x67\x74\x68"]')
 
+def prescan(head):
+    """False if the first characters of the source, `head`, rule out
+    unpacking: MyObfuscate.com output starts with the string table."""
+    return SIGNATURE in head
+
 def detect(source):
     """Detects MyObfuscate.com packer."""
     return SIGNATURE in source
@@ -18,9 +18,16 @@ from jsbeautifier.unpackers import UnpackingError
 
 PRIORITY = 1
 
+SIGNATURE = 'eval(function(p,a,c,k,e,r'
+
+def prescan(head):
+    """False if the first characters of the source, `head`, rule out
+    detect(): they do not start like SIGNATURE, spaces aside."""
+    return SIGNATURE.startswith(head.replace(' ', '')[:len(SIGNATURE)])
+
 def detect(source):
     """Detects whether `source` is P.A.C.K.E.R. coded."""
-    return source.replace(' ', '').startswith('eval(function(p,a,c,k,e,r')
+    return source.replace(' ', '').startswith(SIGNATURE)
 
 def unpack(source):
     """Unpacks P.A.C.K.E.R. packed js code."""
@@ -30,14 +37,22 @@ def unpack(source):
         raise UnpackingError('Malformed p.a.c.k.e.r. symtab.')
 
     try:
-        unbase = Unbaser(radix)
+        unbase = Unbaser(radix, count)
     except TypeError:
         raise UnpackingError('Unknown p.a.c.k.e.r. encoding.')
 
+    # the words the packer writes for each symbol, so that most words are
+    # a single dict lookup; the others are decoded as they come
+    words = dict((word, symtab[index] or word)
+                 for word, index in unbase.table.items())
+
     def lookup(match):
         """Look up symbols in the synthetic symtab."""
         word  = match.group(0)
-        return symtab[unbase(word)] or word
+        try:
+            return words[word]
+        except KeyError:
+            return symtab[unbase(word)] or word
 
     source = re.sub(r'\b\w+\b', lookup, payload)
     return _replacestrings(source)
@@ -61,40 +76,71 @@ def _replacestrings(source):
         varname, strings = match.groups()
         startpoint = len(match.group(0))
         lookup = strings.split('","')
-        variable = '%s[%%d]' % varname
-        for index, value in enumerate(lookup):
-            source = source.replace(variable % index, '"%s"' % value)
+
+        def replace(reference):
+            """Quote the string at the index in `reference`, if any."""
+            index = reference.group(1)
+            # the same text as '%s[%d]' % (varname, position)
+            if str(int(index)) == index and int(index) < len(lookup):
+                return '"%s"' % lookup[int(index)]
+            return reference.group(0)
+
+        source = re.sub(r'%s\[(\d+)\]' % re.escape(varname), replace, source)
         return source[startpoint:]
     return source
 
 
 class Unbaser(object):
     """Functor for a given base. Will efficiently convert
-    strings to natural numbers."""
+    strings to natural numbers: the words for 0 to `count` - 1 are
+    decoded in advance, and up to CACHE_SIZE others as they come."""
+    CACHE_SIZE = 4096
+
     ALPHABET  = {
         62 : '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ',
         95 : (' !"#$%&\'()*+,-./0123456789:;<=>?@ABCDEFGHIJKLMNOPQRSTUVWXYZ'
               '[\]^_`abcdefghijklmnopqrstuvwxyz{|}~')
     }
 
-    def __init__(self, base):
+    def __init__(self, base, count=0):
         self.base = base
 
         # If base can be handled by int() builtin, let it do it for us
         if 2 <= base <= 36:
+            self.digits = '0123456789abcdefghijklmnopqrstuvwxyz'[:base]
             self.unbase = lambda string: int(string, base)
         else:
             # Build conversion dictionary cache
             try:
+                self.digits = self.ALPHABET[base]
                 self.dictionary = dict((cipher, index) for
-                    index, cipher in enumerate(self.ALPHABET[base]))
+                    index, cipher in enumerate(self.digits))
             except KeyError:
                 raise TypeError('Unsupported base encoding.')
 
             self.unbase = self._dictunbaser
 
+        self.table = dict((self.encode(index), index) for index in range(count))
+        self.limit = len(self.table) + self.CACHE_SIZE
+
     def __call__(self, string):
-        return self.unbase(string)
+        try:
+            return self.table[string]
+        except KeyError:
+            value = self.unbase(string)
+            if len(self.table) < self.limit:
+                self.table[string] = value
+            return value
+
+    def encode(self, value):
+        """Encodes a natural number the way p.a.c.k.e.r. does."""
+        digits = self.digits
+        word = digits[value % self.base]
+        value //= self.base
+        while value:
+            word = digits[value % self.base] + word
+            value //= self.base
+        return word
 
     def _dictunbaser(self, string):
         """Decodes a  value to an integer."""
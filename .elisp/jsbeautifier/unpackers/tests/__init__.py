@@ -1,2 +1,5 @@
-# Empty file :)
 # pylint: disable=C0111
+
+# the tests never write the entry point cache of the user
+from jsbeautifier import unpackers
+unpackers.ENTRY_POINT_CACHE = None
@@ -0,0 +1,64 @@
+#
+# Stand-in for a javascript interpreter running evalbased.DRIVER, so that
+# the Pool can be tested without one. It speaks the same protocol and
+# "evaluates" a few expressions:
+#
+#   (function(p,a,c,k,e,r){...}(...))   unpacked with the p.a.c.k.e.r. unpacker
+#   sleep(seconds)                      takes that long, then gives ''
+#   anything with exit() in it          dies
+#   pid()                               the process id
+#   allocate(megabytes)                 allocates that much, then gives ''
+#   throw(message)                      raises message
+#   anything else                       itself
+#
+
+"""Stub javascript interpreter for the evalbased.Pool tests."""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))))
+
+from jsbeautifier.unpackers import packer
+
+def evaluate(expression):
+    """(status, result) of `expression`."""
+    name, _paren, argument = expression.partition('(')
+    argument = argument[:-1]
+    if expression.startswith('(function(p,a,c,k,e,r)'):
+        return 'ok', packer.unpack('eval' + expression)
+    if name == 'sleep':
+        time.sleep(float(argument))
+        return 'ok', ''
+    if 'exit()' in expression:
+        sys.exit(1)
+    if name == 'pid':
+        return 'ok', str(os.getpid())
+    if name == 'allocate':
+        try:
+            memory = b' ' * (int(argument) * 1024 * 1024)
+        except MemoryError:
+            return 'error', 'InternalError: out of memory'
+        return 'ok', str(len(memory) // (1024 * 1024))
+    if name == 'throw':
+        return 'error', argument
+    return 'ok', expression
+
+def main():
+    stdin = getattr(sys.stdin, 'buffer', sys.stdin)
+    stdout = getattr(sys.stdout, 'buffer', sys.stdout)
+    while True:
+        line = stdin.readline()
+        if not line:
+            break
+        lines = [stdin.readline().decode('utf-8').rstrip('\n')
+                 for i in range(int(line))]
+        status, result = evaluate('\n'.join(lines))
+        result = result.split('\n')
+        stdout.write(('%s %d\n%s\n' % (status, len(result), '\n'.join(result))).encode('utf-8'))
+        stdout.flush()
+
+if __name__ == '__main__':
+    main()
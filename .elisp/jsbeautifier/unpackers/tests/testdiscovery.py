@@ -0,0 +1,47 @@
+"""Tests for the loading of the unpackers."""
+
+import os
+import subprocess
+import sys
+import unittest
+
+from jsbeautifier import unpackers
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)))))
+
+# for the processes the tests start: no entry point cache
+ENV = dict(os.environ, JSBEAUTIFIER_ENTRY_POINT_CACHE='')
+
+# pylint: disable=R0904
+class TestDiscovery(unittest.TestCase):
+    """getunpackers() testcase."""
+    def test_getunpackers(self):
+        """Test that the built-in unpackers are found once, by priority."""
+        found = unpackers.getunpackers()
+        self.assertTrue(found is unpackers.getunpackers())
+        self.assertEqual(sorted(mod.__name__ for mod in found), unpackers.BUILTIN)
+        self.assertEqual([mod.PRIORITY for mod in found],
+                         sorted(mod.PRIORITY for mod in found))
+
+    def test_lazy(self):
+        """Test that importing jsbeautifier loads no unpacker."""
+        script = ('import sys, jsbeautifier, jsbeautifier.unpackers\n'
+                  # Python 2 marks failed implicit relative imports with None
+                  'print(sorted(name for name, module in sys.modules.items() '
+                  'if name.startswith("jsbeautifier.unpackers.") and module))\n'
+                  'jsbeautifier.beautify("a = 1")\n'
+                  'print("subprocess" in sys.modules)\n')
+        output = subprocess.check_output([sys.executable, '-c', script], cwd=ROOT, env=ENV)
+        self.assertEqual(output.decode('ascii').split(), ['[]', 'False'])
+
+    def test_cache_setting(self):
+        """Test that $JSBEAUTIFIER_ENTRY_POINT_CACHE moves or turns off the cache."""
+        script = 'from jsbeautifier import unpackers; print(unpackers.ENTRY_POINT_CACHE)'
+        for value, expected in [('entry_points.json', 'entry_points.json'), ('', 'None')]:
+            env = dict(ENV, JSBEAUTIFIER_ENTRY_POINT_CACHE=value)
+            output = subprocess.check_output([sys.executable, '-c', script], cwd=ROOT, env=env)
+            self.assertEqual(output.decode('ascii').strip(), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""Tests for the interpreter pool of the eval() based unpacker, run with
+the stub interpreter in stubjs.py."""
+
+import os
+import sys
+import threading
+import unittest
+
+from jsbeautifier.unpackers import evalbased
+from jsbeautifier.unpackers.tests import __path__ as path
+
+STUB = [sys.executable, os.path.join(path[0], 'stubjs.py')]
+PACKED = os.path.join(path[0], 'test-packer-62-input.js')
+
+# pylint: disable=R0904
+class TestPool(unittest.TestCase):
+    """evalbased.Pool testcase."""
+    def setUp(self):
+        self.pool = evalbased.Pool(size=2, command=STUB, timeout=10)
+
+    def tearDown(self):
+        self.pool.close()
+        evalbased.pool = None
+
+    def test_evaluate(self):
+        """Test that expressions come back whole, from the same interpreter."""
+        for expression in ['a', '', 'multi\nline\n\nexpression', u'caf\xe9 \u2603']:
+            self.assertEqual(self.pool.evaluate(expression), expression)
+        self.assertEqual(len(set(self.pool.evaluate('pid()') for i in range(5))), 1)
+        self.assertRaises(evalbased.EvaluationError, self.pool.evaluate, 'throw(TypeError)')
+        self.assertEqual(self.pool.evaluate('b'), 'b')
+        self.assertEqual(len(self.pool.workers), 1)
+
+    def test_unpack(self):
+        """Test unpack() with and without a pool."""
+        with open(PACKED) as data:
+            source = data.read().replace('eval (', 'eval(')
+        self.assertEqual(evalbased.unpack('var a = 1'), 'var a = 1')
+        evalbased.pool = self.pool
+        unpacked = evalbased.unpack(source)
+        self.assertTrue(unpacked.startswith('var'), unpacked[:20])
+        self.assertEqual(evalbased.unpack('eval(function(){exit()})'),
+                         'eval(function(){exit()})')
+
+    def test_failures(self):
+        """Test that timeouts and dead interpreters are replaced."""
+        pid = self.pool.evaluate('pid()')
+        self.pool.timeout = 0.5
+        self.assertRaises(evalbased.EvaluationError, self.pool.evaluate, 'sleep(5)')
+        self.pool.timeout = 10
+        self.assertRaises(evalbased.EvaluationError, self.pool.evaluate, 'exit()')
+        self.assertNotEqual(self.pool.evaluate('pid()'), pid)
+        self.assertEqual(len(self.pool.workers), 1)
+
+        pool = evalbased.Pool(command=['no such interpreter'])
+        self.assertRaises(evalbased.EvaluationError, pool.evaluate, 'a')
+        self.assertEqual(pool.workers, [])
+
+    def test_recycling(self):
+        """Test that interpreters are replaced after max_evaluations."""
+        self.pool.max_evaluations = 3
+        pids = [self.pool.evaluate('pid()') for i in range(6)]
+        self.assertEqual(len(set(pids[:3])), 1)
+        self.assertEqual(len(set(pids[3:])), 1)
+        self.assertNotEqual(pids[0], pids[3])
+
+    def test_concurrency(self):
+        """Test that no more than `size` interpreters run at once."""
+        results = []
+        def evaluate(i):
+            results.append(self.pool.evaluate('sleep(0.2)') == '' and
+                           self.pool.evaluate('%d' % i) == '%d' % i)
+        threads = [threading.Thread(target=evaluate, args=(i,)) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [True] * 6)
+        self.assertEqual(len(self.pool.workers), 2)
+
+    @unittest.skipIf(evalbased.resource is None, 'no resource limits')
+    def test_memory_limit(self):
+        """Test that interpreters cannot grow past memory_limit."""
+        self.assertEqual(self.pool.memory_limit, None)
+        self.assertEqual(self.pool.evaluate('allocate(1)'), '1')
+        pool = evalbased.Pool(command=STUB, memory_limit=256 * 1024 * 1024)
+        try:
+            self.assertEqual(pool.evaluate('allocate(1)'), '1')
+            self.assertRaises(evalbased.EvaluationError, pool.evaluate, 'allocate(512)')
+            self.assertEqual(pool.evaluate('a'), 'a')
+        finally:
+            pool.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -20,6 +20,8 @@ class TestJavascriptObfuscator(unittest.TestCase):
         equals('"a", "b"', ['"a"', '"b"'])
         equals('"aaa","bbbb"', ['"aaa"', '"bbbb"'])
         equals('"a", "b\\\""', ['"a"', '"b\\\""'])
+        equals('"a\\"b", "c\\\\", "\\"', ['"a\\"b"', '"c\\\\"', '"\\""'])
+        equals('x "a\\"', ['"a\\""'])
 
     def test_detect(self):
         """Test detect() function."""
@@ -42,5 +44,13 @@ class TestJavascriptObfuscator(unittest.TestCase):
                  '{alert(_0xb2a7[0]);} ;', 'var i;for(i=0;i<10;++i){alert'
                  '("t\'est");} ;')
 
+    def test_escaped_quotes(self):
+        """Test unpack() on strings with escaped quotes and backslashes."""
+        decodeto = lambda ob, original: self.assertEqual(unpack(ob), original)
+
+        decodeto('var _0x1f=["a\\"b","c\\\\","\\",\\""];'
+                 'f(_0x1f[0],_0x1f[1],_0x1f[2],_0x1f[02],_0x1f[3]);',
+                 'f("a\\"b","c\\\\","\\",\\"",_0x1f[02],_0x1f[3]);')
+
 if __name__ == '__main__':
     unittest.main()
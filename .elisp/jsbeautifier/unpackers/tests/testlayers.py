@@ -0,0 +1,126 @@
+"""Tests for unpacking sources packed several times over."""
+
+import threading
+import unittest
+
+import jsbeautifier
+from jsbeautifier import unpackers
+
+# urlencoded p.a.c.k.e.r. code, which unpacks to JavascriptObfuscator code
+LAYERED = ('eval%28function%28p%2Ca%2Cc%2Ck%2Ce%2Cr%29%7B%7D%28%271%202%20%3D%20'
+           '%5B%223%22%5D%3B4%282%5B0%5D%29%3B%27%2C62%2C5%2C%27%7Cvar%7C_0x1f%7C'
+           'hello%7Calert%27.split%28%27%7C%27%29%2C0%2C%7B%7D%29%29')
+
+class Swapping(object):
+    """Swaps 'ping()' and 'pong()' forever, or fails on 'fail()'."""
+    PRIORITY = 5
+
+    def detect(self, source):
+        return source in ['ping()', 'pong()'] or source.startswith('fail()')
+
+    def unpack(self, source):
+        if source.startswith('fail()'):
+            raise unpackers.UnpackingError('Cannot unpack fail()')
+        return 'pong()' if source == 'ping()' else 'ping()'
+
+# pylint: disable=R0904
+class TestLayers(unittest.TestCase):
+    """run() with depth and trace testcase."""
+    def setUp(self):
+        unpackers._layers.clear()
+
+    def tearDown(self):
+        unpackers.unregister('swapping')
+
+    def names(self, trace):
+        return [[name.split('.')[-1] for name in layer.names] for layer in trace]
+
+    def test_layers(self):
+        """Test that every layer is unpacked, and traced."""
+        trace = []
+        self.assertEqual(unpackers.run(LAYERED, depth=8, trace=trace), 'alert("hello");')
+        self.assertEqual(self.names(trace), [['urlencode'], ['packer'],
+                                             ['javascriptobfuscator'], []])
+        self.assertEqual([layer.depth for layer in trace], [1, 2, 3, 4])
+        self.assertEqual(trace[0].size, len(LAYERED))
+        self.assertEqual(trace[-1].unpacked_size, len('alert("hello");'))
+        self.assertFalse(any(layer.cached for layer in trace))
+
+        self.assertTrue(unpackers.run(LAYERED).startswith('eval(function(p,a,c,k,e,r)'))
+        trace = []
+        self.assertEqual(unpackers.run(LAYERED, depth=2, trace=trace),
+                         'var _0x1f = ["hello"];alert(_0x1f[0]);')
+        self.assertEqual(len(trace), 2)
+
+    def test_cache(self):
+        """Test that layers met before are not unpacked again."""
+        unpackers.run(LAYERED, depth=8)
+        trace = []
+        self.assertEqual(unpackers.run(LAYERED, depth=8, trace=trace), 'alert("hello");')
+        self.assertTrue(all(layer.cached for layer in trace))
+        unpackers.enable('jsbeautifier.unpackers.packer', False)
+        try:
+            trace = []
+            unpackers.run(LAYERED, depth=8, trace=trace)
+            self.assertEqual(self.names(trace), [['urlencode'], []])
+            self.assertFalse(any(layer.cached for layer in trace))
+        finally:
+            unpackers.enable('jsbeautifier.unpackers.packer')
+
+    def test_eviction(self):
+        """Test that the least recently used layers are forgotten first."""
+        size, unpackers.LAYER_CACHE_SIZE = unpackers.LAYER_CACHE_SIZE, 2
+        try:
+            for source in ['a', 'b', 'a', 'c']:
+                unpackers.run(source, depth=2)
+            for source, cached in [('a', True), ('c', True), ('b', False)]:
+                trace = []
+                unpackers.run(source, depth=2, trace=trace)
+                self.assertEqual(trace[0].cached, cached, source)
+        finally:
+            unpackers.LAYER_CACHE_SIZE = size
+
+    def test_threads(self):
+        """Test that threads sharing a small layer cache get every layer right."""
+        size, unpackers.LAYER_CACHE_SIZE = unpackers.LAYER_CACHE_SIZE, 4
+        errors = []
+        def unpack(i):
+            try:
+                for j in range(200):
+                    source = 'var%%20a%%3D%d' % ((i + j) % 7)
+                    self.assertEqual(unpackers.run(source, depth=8),
+                                     'var a=%d' % ((i + j) % 7))
+            except Exception as error:
+                errors.append(error)
+        threads = [threading.Thread(target=unpack, args=(i,)) for i in range(8)]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            unpackers.LAYER_CACHE_SIZE = size
+        self.assertEqual(errors, [])
+        self.assertTrue(len(unpackers._layers) <= 4)
+
+    def test_cycle_and_errors(self):
+        """Test that unpacking stops on cycles, and on errors past the first layer."""
+        unpackers.register(Swapping(), 'swapping')
+        trace = []
+        self.assertEqual(unpackers.run('ping()', depth=100, trace=trace), 'ping()')
+        self.assertEqual(self.names(trace), [['swapping'], ['swapping']])
+
+        self.assertRaises(unpackers.UnpackingError, unpackers.run, 'fail()', depth=8)
+        trace = []
+        self.assertEqual(unpackers.run('fail%28%29%3B%20', depth=8, trace=trace), 'fail(); ')
+        self.assertEqual(self.names(trace), [['urlencode'], []])
+        self.assertTrue(isinstance(trace[-1].error, unpackers.UnpackingError))
+
+    def test_beautify(self):
+        """Test opts.unpack_depth."""
+        opts = jsbeautifier.default_options()
+        opts.unpack_depth = 8
+        self.assertEqual(jsbeautifier.beautify(LAYERED, opts), 'alert("hello");')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,7 +5,7 @@
 """Tests for P.A.C.K.E.R. unpacker."""
 
 import unittest
-from jsbeautifier.unpackers.packer import detect, unpack
+from jsbeautifier.unpackers.packer import detect, unpack, Unbaser
 
 # pylint: disable=R0904
 class TestPacker(unittest.TestCase):
@@ -30,5 +30,32 @@ class TestPacker(unittest.TestCase):
               "new RegExp('\\\\b'+e(c)+'\\\\b','g'),k[c]);return p}('0 2=1',"
               "62,3,'var||a'.split('|'),0,{}))", 'var a=1')
 
+    def test_string_table(self):
+        """Test unpack() with a large symtab and a table of strings."""
+        symtab = [''] * 10 + ['var', '_0x', 'x'] + ['s%d' % i for i in range(13, 4000)]
+        source = ("eval(function(p,a,c,k,e,r){}('a b=[\"12v\",\"c\"];"
+                  "b[0]+b[1]+b[01]+b[2];',62,4000,'%s'.split('|'),0,{}))" % '|'.join(symtab))
+        self.assertEqual(unpack(source), '"s3999"+"x"+_0x[01]+_0x[2];')
+
+    def test_unbaser(self):
+        """Test Unbaser with and without its table of words."""
+        for base in [10, 36, 62, 95]:
+            slow = Unbaser(base).unbase
+            unbase = Unbaser(base, 5000)
+            self.assertEqual(len(unbase.table), 5000)
+            for value in [0, 1, base - 1, base, 4999]:
+                self.assertEqual(unbase(unbase.encode(value)), value)
+                self.assertEqual(slow(unbase.encode(value)), value)
+            # words outside the table: not how p.a.c.k.e.r. writes 1, and
+            # a value past `count`
+            for word in ['01', '1' * 8]:
+                self.assertEqual(unbase(word), slow(word))
+                self.assertEqual(unbase.table[word], slow(word))
+        unbase = Unbaser(62, 10)
+        for value in range(10 + Unbaser.CACHE_SIZE * 2):
+            self.assertEqual(unbase('0' + unbase.encode(value)), value)
+        self.assertEqual(len(unbase.table), 10 + Unbaser.CACHE_SIZE)
+        self.assertRaises(TypeError, Unbaser, 50)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,81 @@
+"""Tests for the pre-scan deciding which unpackers may apply."""
+
+import io
+import os
+import unittest
+
+import jsbeautifier
+from jsbeautifier import unpackers
+from jsbeautifier.unpackers import (
+    evalbased, javascriptobfuscator, myobfuscate, packer, urlencode)
+from jsbeautifier.unpackers.tests import __path__ as path
+
+INPUT = os.path.join(path[0], 'test-myobfuscate-input.js')
+PACKED = os.path.join(path[0], 'test-packer-62-input.js')
+
+# what open() files read like: str on Python 2 too
+STREAM = io.BytesIO if str is bytes else io.StringIO
+
+# pylint: disable=R0904
+class TestPrescan(unittest.TestCase):
+    """unpackers.prescan() testcase."""
+    def test_candidates(self):
+        """Test which unpackers each kind of source leaves."""
+        with open(INPUT) as data:
+            obfuscated = data.read()
+        with open(PACKED) as data:
+            packed = data.read()
+        candidates = lambda source: unpackers.prescan(source)
+
+        self.assertEqual(candidates('var a = b;\n' * 10000), [])
+        self.assertEqual(candidates('f(a,b);' * 10000), [])
+        self.assertTrue(packer in candidates(packed))
+        self.assertTrue(packer in candidates('  eval ( function(p, a'))
+        self.assertTrue(myobfuscate in candidates(obfuscated))
+        self.assertTrue(javascriptobfuscator in candidates('var _0x1234=["a"]'))
+        self.assertTrue(urlencode in candidates('var%20a=b'))
+        self.assertEqual(unpackers.prescan('\n eval(function(){}', [evalbased]), [evalbased])
+
+    def test_detect(self):
+        """Test that the pre-scan only rules out what detect() would."""
+        with open(INPUT) as data:
+            obfuscated = data.read()
+        with open(PACKED) as data:
+            packed = data.read()
+        for source in [obfuscated, packed, 'var%20a=b', 'var _0x1234=["a"]',
+                       '', 'eval', 'var a = b', ' ' * 5000 + 'eval(function(p,a,c,k,e,r']:
+            for mod in unpackers.getunpackers():
+                if mod.detect(source):
+                    self.assertTrue(mod in unpackers.prescan(source), (mod, source))
+        self.assertTrue(unpackers.detect(packed))
+        self.assertFalse(unpackers.detect('var a = b;\n' * 10000))
+
+    def test_streaming(self):
+        """Test that files read piece by piece are unpacked just like strings:
+        only when their first PRESCAN_SIZE characters pass the pre-scan."""
+        with open(INPUT) as data:
+            obfuscated = data.read()
+        late = 'x=1;' * 2000
+        for source in ['x=1;' * 4 + '%41%42%43%44',
+                       'x=%41;' + 'y=%41;' * 3,
+                       late + '%41%42%43%44',
+                       late + obfuscated,
+                       '  \t' * 2000 + 'var%20a=b',
+                       obfuscated]:
+            for window_size in [1, 7, 4096, 65536]:
+                self.assertEqual(
+                    jsbeautifier.beautify(jsbeautifier.InputSource(STREAM(source), window_size)),
+                    jsbeautifier.beautify(source), (source[:20], window_size))
+        # past the pre-scan, nothing is unpacked
+        self.assertEqual(jsbeautifier.beautify(late + '%41%42%43%44').count('%'), 4)
+        self.assertEqual(jsbeautifier.beautify('x=1;' * 4 + '%41%42%43%44'), 'x = 1;\nx = 1;\nx = 1;\nx = 1;\nABCD')
+
+    def test_disabled(self):
+        """Test that opts.unpack = False leaves packed code as it is."""
+        opts = jsbeautifier.default_options()
+        self.assertEqual(jsbeautifier.beautify('var%20a=b', opts), 'var a = b')
+        opts.unpack = False
+        self.assertEqual(jsbeautifier.beautify('var%20a=b', opts), 'var % 20a = b')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+"""Tests for the registry of unpackers."""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+import warnings
+
+import jsbeautifier
+from jsbeautifier import unpackers
+from jsbeautifier.unpackers import urlencode
+
+class Shouting(object):
+    """Unpacks 'SHOUT(...)' to lower case, for the tests."""
+    PRIORITY = 5
+
+    def detect(self, source):
+        return source.startswith('SHOUT(')
+
+    def unpack(self, source):
+        return source[6:-1].lower() if self.detect(source) else source
+
+SHOUTING = Shouting()
+
+# pylint: disable=R0904
+class TestRegistry(unittest.TestCase):
+    """register(), enable() and entry point discovery testcase."""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.saved = (unpackers._registry[:], unpackers._discovered,
+                      unpackers.ENTRY_POINT_CACHE, unpackers._scan_entry_points)
+        unpackers.getunpackers()
+        self.enabled = [(registration, registration.enabled)
+                        for registration in unpackers.registry()]
+        unpackers.ENTRY_POINT_CACHE = os.path.join(self.directory, 'cache', 'entry_points.json')
+        self.path = sys.path[:]
+
+    def tearDown(self):
+        (unpackers._registry[:], unpackers._discovered,
+         unpackers.ENTRY_POINT_CACHE, unpackers._scan_entry_points) = self.saved
+        for registration, enabled in self.enabled:
+            registration.enabled = enabled
+        unpackers._unpackers = None
+        sys.path[:] = self.path
+        shutil.rmtree(self.directory)
+
+    def undiscover(self, *entry_points):
+        """Forgets the registry, and installs a distribution declaring
+        `entry_points` on sys.path."""
+        unpackers._discovered = False
+        unpackers._unpackers = None
+        del unpackers._registry[:]
+        distribution = os.path.join(self.directory, 'site', 'vendor-1.0.dist-info')
+        if not os.path.isdir(distribution):
+            os.makedirs(distribution)
+        with open(os.path.join(distribution, 'entry_points.txt'), 'w') as data:
+            data.write('[%s]\n%s\n' % (unpackers.ENTRY_POINT_GROUP, '\n'.join(
+                '%s = %s' % entry_point for entry_point in entry_points)))
+        sys.path.insert(0, os.path.dirname(distribution))
+
+    def test_register(self):
+        """Test that registered unpackers run by priority until unregistered."""
+        self.assertFalse(SHOUTING in unpackers.getunpackers())
+        registration = unpackers.register(SHOUTING, 'shouting')
+        self.assertEqual(registration.priority, 5)
+        found = unpackers.getunpackers()
+        self.assertTrue(SHOUTING in found)
+        self.assertEqual(found[-1], SHOUTING)
+        self.assertEqual(jsbeautifier.beautify('SHOUT(VAR A=B)'), 'var a = b')
+
+        unpackers.register(SHOUTING, 'shouting', priority=-1)
+        self.assertEqual(unpackers.getunpackers()[0], SHOUTING)
+        self.assertEqual([r.name for r in unpackers.registry()].count('shouting'), 1)
+
+        unpackers.unregister('shouting')
+        self.assertFalse(SHOUTING in unpackers.getunpackers())
+        self.assertEqual(jsbeautifier.beautify('SHOUT(VAR A=B)'), 'SHOUT(VAR A = B)')
+
+    def test_bad(self):
+        """Test that objects which cannot unpack are refused."""
+        self.assertRaises(unpackers.UnpackingError, unpackers.register, object())
+        del Shouting.PRIORITY
+        try:
+            self.assertRaises(unpackers.UnpackingError, unpackers.register, Shouting())
+        finally:
+            Shouting.PRIORITY = 5
+        self.assertRaises(unpackers.UnpackingError, unpackers.enable, 'nothing')
+
+    def test_enable(self):
+        """Test that disabled unpackers do not run."""
+        self.assertEqual(jsbeautifier.beautify('var%20a=b'), 'var a = b')
+        unpackers.enable(urlencode.__name__, False)
+        self.assertFalse(urlencode in unpackers.getunpackers())
+        self.assertEqual(jsbeautifier.beautify('var%20a=b'), 'var % 20a = b')
+        unpackers.enable(urlencode.__name__)
+        self.assertTrue(urlencode in unpackers.getunpackers())
+
+    def test_entry_points(self):
+        """Test that entry points are loaded, and scanned for once."""
+        scans = []
+        def scan():
+            scans.append(1)
+            return [['shouting', __name__ + ':SHOUTING']]
+        unpackers._scan_entry_points = scan
+        self.undiscover(('shouting', __name__ + ':SHOUTING'))
+
+        self.assertTrue(SHOUTING in unpackers.getunpackers())
+        self.assertEqual(len(scans), 1)
+        self.assertTrue(os.path.exists(unpackers.ENTRY_POINT_CACHE))
+        self.assertEqual(unpackers._entry_points(), [('shouting', __name__ + ':SHOUTING')])
+        self.assertEqual(len(scans), 1)
+
+        unpackers.ENTRY_POINT_CACHE = None
+        unpackers._entry_points()
+        self.assertEqual(len(scans), 2)
+
+        sys.path[:] = self.path
+        self.assertEqual(unpackers._entry_points(), [])
+        self.assertEqual(len(scans), 2)
+
+    def test_bad_entry_points(self):
+        """Test that entry points which fail to load are left out."""
+        unpackers._scan_entry_points = lambda: [['missing', 'no_such_module'],
+                                                ['object', 'os:sep']]
+        self.undiscover(('missing', 'no_such_module'), ('object', 'os:sep'))
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            self.assertEqual(jsbeautifier.beautify('var%20a=b'), 'var a = b')
+        self.assertEqual(len(caught), 2)
+        self.assertEqual(sorted(mod.__name__ for mod in unpackers.getunpackers()),
+                         unpackers.BUILTIN)
+
+    def test_concurrent_discovery(self):
+        """Test that threads using the unpackers first register them once."""
+        self.undiscover()
+        results = []
+        def beautify():
+            results.append(jsbeautifier.beautify('var%2520a%253D%2522b%2522'))
+        threads = [threading.Thread(target=beautify) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # decoded once: urlencode is registered once
+        self.assertEqual(results, ['var % 20a % 3D % 22b % 22'] * 8)
+        self.assertEqual(len(unpackers.registry()), len(unpackers.BUILTIN))
+
+if __name__ == '__main__':
+    unittest.main()
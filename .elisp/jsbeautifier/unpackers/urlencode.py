@@ -23,6 +23,11 @@ except ImportError:
 
 PRIORITY = 0
 
+def prescan(head):
+    """False if the first characters of the code, `head`, rule out
+    unpacking: they have a space, or not a single escape."""
+    return ' ' not in head and '%' in head
+
 def detect(code):
     """Detects if a scriptlet is urlencoded."""
     # the fact that script doesn't contain any space, but has %20 instead